@@ -1,7 +1,108 @@
+import csv
+
+import orjson
+from django.conf import settings
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.urls import path
+from django.utils import timezone
 from users.models import CustomUser, Subscription
 from recipes.models import (Recipe, Ingredient, RecipeIngredient,
                             Favorite, ShoppingCart)
+from .models import Job, SlowQuery
+
+
+def count_of(queryset, field):
+    """Число строк ``queryset``, связанных с текущей строкой через
+    ``field``, отдельным подзапросом: два ``Count`` по разным обратным
+    связям в одном запросе перемножают строки соединения.
+    """
+    counts = (queryset.filter(**{field: OuterRef('pk')})
+              .order_by().values(field)
+              .annotate(count=Count('pk')).values('count'))
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(fields, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(fields, rows):
+    for row in rows:
+        yield orjson.dumps(dict(zip(fields, row))) + b'\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson'),
+}
+
+
+class ExportMixin:
+    """Потоковая выгрузка в CSV или NDJSON: действие для выбранных
+    строк и ссылка на весь список с текущими фильтрами и поиском.
+
+    Строки читаются ``values_list(*export_fields)`` серверным курсором,
+    счетчики должны быть аннотациями из ``get_queryset``.
+    """
+
+    change_list_template = 'admin/export_change_list.html'
+    actions = ['export_csv', 'export_ndjson']
+    export_fields = ()
+
+    def export_response(self, queryset, export_format):
+        stream, content_type = EXPORT_FORMATS[export_format]
+        rows = queryset.values_list(*self.export_fields).iterator(
+            chunk_size=settings.EXPORT_CHUNK_SIZE)
+        response = StreamingHttpResponse(
+            stream(self.export_fields, rows), content_type=content_type)
+        filename = '{}-{}.{}'.format(
+            self.opts.model_name,
+            timezone.now().strftime('%Y%m%d-%H%M%S'), export_format)
+        response['Content-Disposition'] = (
+            f'attachment; filename="{filename}"')
+        return response
+
+    @admin.action(description='Экспорт выбранных в CSV')
+    def export_csv(self, request, queryset):
+        return self.export_response(queryset, 'csv')
+
+    @admin.action(description='Экспорт выбранных в NDJSON')
+    def export_ndjson(self, request, queryset):
+        return self.export_response(queryset, 'ndjson')
+
+    def get_urls(self):
+        return [
+            path('export/', self.admin_site.admin_view(self.export_view),
+                 name='{}_{}_export'.format(self.opts.app_label,
+                                            self.opts.model_name)),
+            *super().get_urls(),
+        ]
+
+    def export_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        params = request.GET.copy()
+        export_format = params.pop('format', ['csv'])[-1]
+        if export_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest(
+                'Формат выгрузки: ' + ', '.join(EXPORT_FORMATS))
+        # Список строится так же, как страница админки,
+        # поэтому выгрузка учитывает фильтры, поиск и сортировку.
+        request.GET = params
+        changelist = self.get_changelist_instance(request)
+        return self.export_response(changelist.queryset, export_format)
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -10,15 +111,24 @@ class RecipeIngredientInline(admin.TabularInline):
 
 
 @admin.register(CustomUser)
-class CustomUserAdmin(admin.ModelAdmin):
+class CustomUserAdmin(ExportMixin, admin.ModelAdmin):
     list_display = ('id', 'email', 'username', 'first_name',
                     'last_name', 'is_staff', 'followers_count')
     search_fields = ('email', 'username')
     list_filter = ('is_staff', 'is_superuser')
+    export_fields = ('id', 'email', 'username', 'first_name', 'last_name',
+                     'is_staff', 'date_joined', 'followers_count',
+                     'recipes_count')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            followers_count=count_of(Subscription.objects, 'following'),
+            recipes_count=count_of(Recipe.objects, 'author'),
+        )
 
+    @admin.display(description='Подписчики', ordering='followers_count')
     def followers_count(self, obj):
-        return obj.subscribers.count()
-    followers_count.short_description = 'Подписчики'
+        return obj.followers_count
 
 
 @admin.register(Subscription)
@@ -34,16 +144,26 @@ class IngredientAdmin(admin.ModelAdmin):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(ExportMixin, admin.ModelAdmin):
     list_display = ('id', 'name', 'author', 'cooking_time',
                     'pub_date', 'favorites_count')
+    list_select_related = ('author',)
     search_fields = ('name', 'author__username')
     list_filter = ('pub_date', 'author')
     inlines = [RecipeIngredientInline]
+    export_fields = ('id', 'name', 'author_id', 'author__email',
+                     'cooking_time', 'pub_date', 'favorites_count',
+                     'shopping_cart_count')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            favorites_count=count_of(Favorite.objects, 'recipe'),
+            shopping_cart_count=count_of(ShoppingCart.objects, 'recipe'),
+        )
 
+    @admin.display(description='В избранном', ordering='favorites_count')
     def favorites_count(self, obj):
-        return obj.favorited_by.count()
-    favorites_count.short_description = 'В избранном'
+        return obj.favorites_count
 
 
 @admin.register(RecipeIngredient)
@@ -53,12 +173,36 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(ExportMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
+    export_fields = ('id', 'user_id', 'user__email', 'recipe_id',
+                     'recipe__name')
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(ExportMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
+    export_fields = ('id', 'user_id', 'user__email', 'recipe_id',
+                     'recipe__name')
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task', 'status', 'attempts', 'run_at',
+                    'created_at', 'finished_at')
+    list_filter = ('status', 'task')
+    search_fields = ('task', 'idempotency_key')
+    readonly_fields = ('locked_at', 'locked_by', 'last_error')
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'caller', 'count', 'total_time', 'max_time',
+                    'last_seen')
+    search_fields = ('caller', 'sql')
+    readonly_fields = ('fingerprint', 'sql', 'caller', 'plan', 'count',
+                       'total_time', 'max_time', 'first_seen', 'last_seen')
@@ -0,0 +1,105 @@
+import hashlib
+import threading
+import time
+from collections import namedtuple
+
+import orjson
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.http import parse_etags
+
+from recipes.models import Ingredient
+from .middleware import brotli, compress
+from .singleflight import SingleFlight
+from .versions import get_table_version
+
+Snapshot = namedtuple('Snapshot',
+                      'version body etag precompressed built_at stale')
+
+# Документ собирается один раз на все процессы.
+catalogue_bodies = SingleFlight(
+    'ingredient-catalogue', settings.INGREDIENT_CATALOGUE_MAX_AGE)
+
+
+class IngredientCatalogue:
+    """Весь справочник ингредиентов одним JSON-документом.
+
+    Документ и его сжатые варианты хранятся в памяти процесса
+    и пересобираются при смене версии таблицы ингредиентов, а также
+    не реже раза в ``INGREDIENT_CATALOGUE_SNAPSHOT_MAX_AGE`` секунд;
+    сам JSON берется из общего кеша через ``catalogue_bodies``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def stamp(self):
+        # Версия таблицы из общего кеша плюс отпечаток данных из базы:
+        # изменение в обход сигналов и bump_table_version тоже заметно.
+        stats = Ingredient.objects.aggregate(count=Count('id'), last=Max('id'))
+        return (get_table_version(Ingredient._meta.db_table),
+                stats['count'], stats['last'])
+
+    def build(self, version):
+        body, body_version = catalogue_bodies.get_versioned(
+            'ingredients', lambda: orjson.dumps(list(
+                Ingredient.objects.order_by('id').values(
+                    'id', 'name', 'measurement_unit'))), version)
+        precompressed = {}
+        if settings.INGREDIENT_CATALOGUE_PRECOMPRESS:
+            encodings = ('br', 'gzip') if brotli else ('gzip',)
+            precompressed = {encoding: compress(body, encoding)
+                             for encoding in encodings}
+        etag = '"{}"'.format(hashlib.sha256(body).hexdigest()[:32])
+        return Snapshot(version, body, etag, precompressed, time.monotonic(),
+                        stale=body_version != version)
+
+    def is_current(self, snapshot):
+        return (snapshot is not None
+                and snapshot.version[0] == get_table_version(
+                    Ingredient._meta.db_table)
+                and time.monotonic() - snapshot.built_at
+                < settings.INGREDIENT_CATALOGUE_SNAPSHOT_MAX_AGE)
+
+    def get(self):
+        snapshot = self._snapshot
+        if self.is_current(snapshot):
+            return snapshot
+        # Пока один поток пересобирает документ, остальные отдают
+        # предыдущую версию, а не ждут.
+        if not self._lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            snapshot = self._snapshot
+            if self.is_current(snapshot):
+                return snapshot
+            version = self.stamp()
+            if snapshot is not None and snapshot.version == version:
+                snapshot = snapshot._replace(built_at=time.monotonic())
+            else:
+                snapshot = self.build(version)
+            # Пока документ новой версии собирает другой процесс, нам
+            # достается прежний: его нельзя запомнить под новой меткой,
+            # иначе он переживет следующую проверку.
+            if not snapshot.stale:
+                self._snapshot = snapshot
+            return snapshot
+        finally:
+            self._lock.release()
+
+
+def matching_etag(request, etag):
+    # Сжатые варианты отдаются с суффиксом кодировки, см. middleware.
+    for tag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        if tag == '*':
+            return etag
+        base = tag.removeprefix('W/')
+        for encoding in ('br', 'gzip'):
+            base = base.replace(f'-{encoding}"', '"')
+        if base == etag:
+            return tag
+    return None
+
+
+ingredient_catalogue = IngredientCatalogue()
@@ -0,0 +1,239 @@
+from contextlib import contextmanager
+from itertools import groupby
+
+import orjson
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Max
+
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from users.models import Subscription
+from .models import Change
+
+EXPORTED_FIELDS = {
+    Recipe: ('id', 'author_id', 'name', 'text', 'cooking_time', 'image',
+             'short_link', 'pub_date'),
+    RecipeIngredient: ('id', 'recipe_id', 'ingredient_id', 'amount'),
+    Favorite: ('id', 'user_id', 'recipe_id'),
+    ShoppingCart: ('id', 'user_id', 'recipe_id'),
+    Subscription: ('id', 'follower_id', 'following_id', 'created_at'),
+}
+NATURAL_KEYS = {
+    Recipe: ('id',),
+    RecipeIngredient: ('recipe_id', 'ingredient_id'),
+    Favorite: ('user_id', 'recipe_id'),
+    ShoppingCart: ('user_id', 'recipe_id'),
+    Subscription: ('follower_id', 'following_id'),
+}
+TRACKED_MODELS = {model._meta.label_lower: model for model in EXPORTED_FIELDS}
+# Пара ключей рекомендательной блокировки, под которой выдаются номера
+# записей журнала. Однословные (bigint) рекомендательные блокировки
+# зарезервированы за номерами незакоммиченных записей.
+ALLOCATION_LOCK = (0x6368, 0x6e67)
+RESERVE_IDS_SQL = """
+    SELECT array_agg(id), pg_advisory_xact_lock(min(id))
+    FROM (SELECT nextval(pg_get_serial_sequence(%s, 'id')) AS id
+          FROM generate_series(1, %s)) AS ids
+"""
+SAFE_CURSOR_SQL = """
+    SELECT COALESCE(
+        (SELECT min((classid::bigint << 32) | objid::bigint) - 1
+         FROM pg_locks
+         WHERE locktype = 'advisory' AND objsubid = 1 AND granted
+           AND database = (SELECT oid FROM pg_database
+                           WHERE datname = current_database())),
+        pg_sequence_last_value(pg_get_serial_sequence(%s, 'id')::regclass),
+        0)
+"""
+
+
+def is_tracked(model):
+    return model in EXPORTED_FIELDS
+
+
+def natural_key(model, values):
+    return {field: values[field] for field in NATURAL_KEYS[model]
+            if field in values}
+
+
+@contextmanager
+def allocation_lock(connection):
+    # Короткая сессионная блокировка выдачи номеров журнала:
+    # держится несколько запросов, а не до коммита.
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_lock(%s, %s)', ALLOCATION_LOCK)
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s, %s)',
+                           ALLOCATION_LOCK)
+
+
+def reserve_ids(connection, count):
+    # Номера берутся из последовательности, и до коммита транзакция
+    # держит рекомендательную блокировку с ключом, равным наименьшему
+    # из них: по ней читатели узнают, где остановиться.
+    # Точка сохранения при ошибке возвращает транзакцию в рабочее
+    # состояние, так что сессионная блокировка снимается всегда.
+    with allocation_lock(connection), transaction.atomic(
+            using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(RESERVE_IDS_SQL, [Change._meta.db_table, count])
+        return sorted(cursor.fetchone()[0])
+
+
+def append_changes(entries):
+    """Добавляет записи в журнал так, чтобы курсор читателя не обгонял
+    незакоммиченные записи.
+
+    ``id`` выдается раньше, чем запись становится видна: без этого
+    читатель мог бы сдвинуть курсор за номер, который еще
+    не закоммичен, и пропустить его навсегда. В PostgreSQL пишущие
+    транзакции друг друга не ждут: каждая отмечает свой наименьший
+    номер блокировкой (см. ``reserve_ids``), а ``current_cursor``
+    не заходит за самый ранний из отмеченных. SQLite и так выполняет
+    записи по одной.
+    """
+    if not entries:
+        return
+    using = Change.objects.db
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        if connection.vendor == 'postgresql':
+            for entry, pk in zip(entries,
+                                 reserve_ids(connection, len(entries))):
+                entry.id = pk
+        Change.objects.bulk_create(entries)
+
+
+def record_changes(model, operation, ids=(), keys=None):
+    """Записывает изменения строк, которые прошли мимо сигналов
+    (``bulk_create``, ``update``, прямые ``DELETE``).
+
+    ``keys`` — естественные ключи строк ``ids`` в том же порядке;
+    по умолчанию удаление записывается с ключом ``{'id': pk}``.
+    """
+    if keys is None:
+        keys = [{'id': pk} if operation == Change.DELETE else {}
+                for pk in ids]
+    label = model._meta.label_lower
+    append_changes([Change(model=label, object_id=pk, operation=operation,
+                           key=key)
+                    for pk, key in zip(ids, keys)])
+
+
+def record_deletions(queryset):
+    """Записывает удаление строк ``queryset`` с естественными ключами.
+    Вызывается до прямого ``DELETE``, пока строки еще можно прочитать.
+    """
+    model = queryset.model
+    fields = dict.fromkeys(('id', *NATURAL_KEYS[model]))
+    label = model._meta.label_lower
+    append_changes([
+        Change(model=label, object_id=values['id'],
+               operation=Change.DELETE, key=natural_key(model, values))
+        for values in queryset.values(*fields).iterator(
+            chunk_size=settings.CHANGES_CHUNK_SIZE)])
+
+
+def record_instance_change(instance, operation):
+    model = type(instance)
+    key = {}
+    if operation == Change.DELETE:
+        key = natural_key(model, {field: getattr(instance, field)
+                                  for field in EXPORTED_FIELDS[model]})
+    append_changes([Change(model=model._meta.label_lower,
+                           object_id=instance.pk, operation=operation,
+                           key=key)])
+
+
+def current_cursor():
+    """Номер, до которого журнал можно читать без пропусков: все записи
+    с меньшими номерами закоммичены или откачены.
+    """
+    connection = connections[Change.objects.db]
+    if connection.vendor != 'postgresql':
+        return Change.objects.aggregate(cursor=Max('id'))['cursor'] or 0
+    # Под блокировкой выдачи номеров не бывает номера, уже взятого
+    # из последовательности, но еще не отмеченного блокировкой.
+    with allocation_lock(connection), connection.cursor() as cursor:
+        cursor.execute(SAFE_CURSOR_SQL, [Change._meta.db_table])
+        return cursor.fetchone()[0]
+
+
+def parse_models(value):
+    if not value:
+        return list(EXPORTED_FIELDS)
+    labels = [label.strip() for label in value.split(',') if label.strip()]
+    unknown = [label for label in labels if label not in TRACKED_MODELS]
+    if unknown:
+        raise ValueError(', '.join(unknown))
+    return [TRACKED_MODELS[label] for label in labels]
+
+
+def iter_snapshot(models):
+    chunk_size = settings.CHANGES_CHUNK_SIZE
+    for model in models:
+        fields = EXPORTED_FIELDS[model]
+        label = model._meta.label_lower
+        rows = (model._default_manager.order_by('pk')
+                .values_list(*fields).iterator(chunk_size=chunk_size))
+        for row in rows:
+            data = dict(zip(fields, row))
+            yield {'seq': None, 'model': label, 'op': Change.SAVE,
+                   'id': data['id'], 'data': data}
+
+
+def iter_changes(cursor, upper, models):
+    """Изменения из журнала в интервале ``(cursor, upper]``.
+
+    Журнал читается серверным курсором пачками; для каждой пачки
+    текущие строки подгружаются одним запросом на модель, а повторные
+    изменения одной записи внутри пачки схлопываются в последнее.
+    """
+    chunk_size = settings.CHANGES_CHUNK_SIZE
+    labels = [model._meta.label_lower for model in models]
+    entries = (Change.objects
+               .filter(id__gt=cursor, id__lte=upper, model__in=labels)
+               .order_by('id')
+               .values_list('id', 'model', 'object_id', 'operation', 'key')
+               .iterator(chunk_size=chunk_size))
+    for _, chunk in groupby(enumerate(entries),
+                            key=lambda item: item[0] // chunk_size):
+        yield from resolve_chunk([entry for _, entry in chunk])
+
+
+def resolve_chunk(chunk):
+    latest = {}
+    for entry in chunk:
+        seq, label, object_id, operation, key = entry
+        identity = (label, object_id) if object_id is not None else seq
+        latest.pop(identity, None)
+        latest[identity] = entry
+    saved = {}
+    for seq, label, object_id, operation, key in latest.values():
+        if operation == Change.SAVE:
+            saved.setdefault(label, []).append(object_id)
+    rows = {}
+    for label, ids in saved.items():
+        model = TRACKED_MODELS[label]
+        fields = EXPORTED_FIELDS[model]
+        for row in (model._default_manager.filter(pk__in=ids)
+                    .values_list(*fields)):
+            rows[(label, row[0])] = dict(zip(fields, row))
+    for seq, label, object_id, operation, key in sorted(latest.values()):
+        if operation == Change.DELETE:
+            yield {'seq': seq, 'model': label, 'op': Change.DELETE,
+                   'id': object_id, 'key': key}
+            continue
+        data = rows.get((label, object_id))
+        # Запись уже удалена: удаление придет отдельным изменением.
+        if data is not None:
+            yield {'seq': seq, 'model': label, 'op': Change.SAVE,
+                   'id': object_id, 'data': data}
+
+
+def ndjson(records, cursor):
+    for record in records:
+        yield orjson.dumps(record) + b'\n'
+    yield orjson.dumps({'cursor': cursor}) + b'\n'
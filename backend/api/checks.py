@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Бэкенды, у которых ``incr`` не атомарен между процессами.
+NON_ATOMIC_BACKENDS = (
+    'django.core.cache.backends.db.DatabaseCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_atomic_cache(app_configs, **kwargs):
+    return [
+        Warning(
+            f'Кеш «{alias}» ({options["BACKEND"]}) не поддерживает '
+            'атомарный incr между процессами: ограничение частоты '
+            'и версии таблиц будут терять приращения.',
+            hint='Укажите CACHE_BACKEND=django.core.cache.backends.redis.'
+                 'RedisCache и адрес Redis в CACHE_LOCATION.',
+            id='api.W001',
+        )
+        for alias, options in settings.CACHES.items()
+        if options['BACKEND'] in NON_ATOMIC_BACKENDS
+    ]
@@ -0,0 +1,219 @@
+import asyncio
+from collections import defaultdict
+
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.db.models import Count, Max
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Favorite, Recipe
+from users.models import Subscription
+from .changes import current_cursor, iter_changes
+from .models import Change
+from .views import parse_id_list
+
+
+class Subscriber:
+    """Одно SSE-соединение: кому оно интересно и что ждет отправки.
+
+    Неотправленные события схлопываются по ключу: медленный клиент
+    получит только последнее значение счетчика, а очередь не растет
+    дальше ``EVENTS_MAX_PENDING``.
+    """
+
+    __slots__ = ('user_id', 'following', 'recipes', 'pending', 'ready')
+
+    def __init__(self, user_id, following, recipes):
+        self.user_id = user_id
+        self.following = following
+        self.recipes = recipes
+        self.pending = {}
+        self.ready = asyncio.Event()
+
+    def push(self, key, event):
+        self.pending.pop(key, None)
+        self.pending[key] = event
+        while len(self.pending) > settings.EVENTS_MAX_PENDING:
+            self.pending.pop(next(iter(self.pending)))
+        self.ready.set()
+
+    def drain(self):
+        events = list(self.pending.values())
+        self.pending.clear()
+        self.ready.clear()
+        return events
+
+
+class Broadcaster:
+    """Рассылка событий подписчикам внутри процесса.
+
+    Один цикл на процесс раз в ``EVENTS_POLL_INTERVAL`` секунд читает
+    журнал изменений (``Change``), поэтому нагрузка на базу не зависит
+    от числа соединений, а события от всех процессов-обработчиков
+    и фоновых задач доходят до любого ASGI-процесса. Пока подписчиков
+    нет, цикл не работает.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.by_user = defaultdict(set)
+        self.by_recipe = defaultdict(set)
+        self.cursor = None
+        self.last_recipe_id = None
+        self._task = None
+
+    def subscribe(self, subscriber):
+        self.subscribers.add(subscriber)
+        if subscriber.user_id is not None:
+            self.by_user[subscriber.user_id].add(subscriber)
+        for recipe_id in subscriber.recipes:
+            self.by_recipe[recipe_id].add(subscriber)
+        loop = asyncio.get_running_loop()
+        if (self._task is None or self._task.done()
+                or self._task.get_loop() is not loop):
+            self.cursor = None
+            self._task = loop.create_task(self._run())
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+        for index, key in ([(self.by_user, subscriber.user_id)]
+                           + [(self.by_recipe, recipe_id)
+                              for recipe_id in subscriber.recipes]):
+            subscribers = index.get(key)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del index[key]
+
+    def start_position(self):
+        close_old_connections()
+        self.cursor = current_cursor()
+        self.last_recipe_id = Recipe.all_objects.aggregate(
+            last=Max('id'))['last'] or 0
+
+    def poll(self):
+        close_old_connections()
+        upper = current_cursor()
+        if upper <= self.cursor:
+            return upper, [], [], {}
+        recipes, follows, favorited = [], [], set()
+        for record in iter_changes(self.cursor, upper,
+                                   [Recipe, Favorite, Subscription]):
+            data = record.get('data') or record.get('key') or {}
+            if record['model'] == 'recipes.recipe':
+                if (record['op'] == Change.SAVE
+                        and record['id'] > self.last_recipe_id):
+                    self.last_recipe_id = record['id']
+                    recipes.append(data)
+            elif record['model'] == 'recipes.favorite':
+                if 'recipe_id' in data:
+                    favorited.add(data['recipe_id'])
+            elif 'follower_id' in data:
+                follows.append((record['op'], data['follower_id'],
+                                data['following_id']))
+        counts = {}
+        watched = favorited & set(self.by_recipe)
+        if watched:
+            counts = dict.fromkeys(watched, 0)
+            counts.update(Favorite.objects.filter(recipe_id__in=watched)
+                          .values_list('recipe_id')
+                          .annotate(count=Count('id')))
+        return upper, recipes, follows, counts
+
+    def dispatch(self, cursor, recipes, follows, counts):
+        for operation, follower_id, following_id in follows:
+            for subscriber in self.by_user.get(follower_id, ()):
+                if operation == Change.SAVE:
+                    subscriber.following.add(following_id)
+                else:
+                    subscriber.following.discard(following_id)
+        for recipe in recipes:
+            event = (cursor, 'recipe', {
+                'id': recipe['id'], 'name': recipe['name'],
+                'author': recipe['author_id']})
+            for subscriber in self.subscribers:
+                if recipe['author_id'] in subscriber.following:
+                    subscriber.push(('recipe', recipe['id']), event)
+        for recipe_id, count in counts.items():
+            event = (cursor, 'counts', {'id': recipe_id,
+                                        'favorites_count': count})
+            for subscriber in self.by_recipe.get(recipe_id, ()):
+                subscriber.push(('counts', recipe_id), event)
+
+    async def _run(self):
+        await sync_to_async(self.start_position)()
+        while self.subscribers:
+            await asyncio.sleep(settings.EVENTS_POLL_INTERVAL)
+            if not self.subscribers:
+                break
+            cursor, recipes, follows, counts = await sync_to_async(
+                self.poll)()
+            self.cursor = cursor
+            self.dispatch(cursor, recipes, follows, counts)
+
+
+broadcaster = Broadcaster()
+
+
+async def authenticate(request):
+    # EventSource не умеет передавать заголовки, поэтому токен
+    # принимается и в параметре ``token``.
+    header = request.headers.get('Authorization', '')
+    key = (header.split(' ', 1)[1] if header.startswith('Token ')
+           else request.GET.get('token'))
+    if not key:
+        return None
+    token = await Token.objects.select_related('user').filter(
+        key=key, user__is_active=True).afirst()
+    return token.user if token is not None else None
+
+
+def format_event(cursor, name, data):
+    return (f'id: {cursor}\nevent: {name}\ndata: '.encode()
+            + orjson.dumps(data) + b'\n\n')
+
+
+async def event_stream(request):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'error': 'Поток событий доступен только через ASGI'},
+            status=501)
+    recipes = parse_id_list(request.GET.get('recipes', ''))
+    if recipes is None or len(recipes) > settings.EVENTS_MAX_RECIPES:
+        return JsonResponse(
+            {'error': 'Укажите до {} id рецептов через запятую'.format(
+                settings.EVENTS_MAX_RECIPES)},
+            status=400)
+    user = await authenticate(request)
+    following = set()
+    if user is not None:
+        following = {pk async for pk in Subscription.objects.filter(
+            follower=user).values_list('following_id', flat=True)}
+    subscriber = Subscriber(user.pk if user else None, following,
+                            frozenset(recipes))
+
+    async def stream():
+        broadcaster.subscribe(subscriber)
+        try:
+            yield f'retry: {settings.EVENTS_RETRY}\n\n'.encode()
+            while True:
+                try:
+                    await asyncio.wait_for(subscriber.ready.wait(),
+                                           settings.EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield b': ping\n\n'
+                    continue
+                for event in subscriber.drain():
+                    yield format_event(*event)
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    response = StreamingHttpResponse(stream(),
+                                     content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,5 +1,10 @@
+from django.db.models import Count
 from django_filters import rest_framework as filters
-from recipes.models import Recipe, Ingredient
+from recipes.models import Recipe, Ingredient, RecipeIngredient
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
 
 
 class RecipeFilter(filters.FilterSet):
@@ -7,11 +12,42 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
     author = filters.NumberFilter(field_name='author__id')
+    ingredients = NumberInFilter(method='filter_ingredients')
+    ingredients_any = NumberInFilter(method='filter_ingredients_any')
+    exclude_ingredients = NumberInFilter(method='filter_exclude_ingredients')
+    cooking_time_max = filters.NumberFilter(field_name='cooking_time',
+                                            lookup_expr='lte')
 
     class Meta:
         model = Recipe
         fields = ['author']
 
+    @staticmethod
+    def recipes_with_ingredients(ingredient_ids):
+        return RecipeIngredient.objects.filter(
+            ingredient_id__in=ingredient_ids).values('recipe_id')
+
+    def filter_ingredients(self, queryset, name, value):
+        ingredient_ids = set(value)
+        if not ingredient_ids:
+            return queryset
+        return queryset.filter(id__in=self.recipes_with_ingredients(
+            ingredient_ids).annotate(
+            matched=Count('ingredient_id')).filter(
+            matched=len(ingredient_ids)).values('recipe_id'))
+
+    def filter_ingredients_any(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(
+            id__in=self.recipes_with_ingredients(set(value)))
+
+    def filter_exclude_ingredients(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.exclude(
+            id__in=self.recipes_with_ingredients(set(value)))
+
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
             return queryset.filter(favorited_by__user=self.request.user)
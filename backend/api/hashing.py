@@ -0,0 +1,116 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password, verify_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Сервер перегружен, повторите попытку позже.'
+    default_code = 'hashing_busy'
+
+    def __init__(self, wait=1):
+        super().__init__()
+        # Обработчик исключений DRF выставит заголовок Retry-After.
+        self.wait = wait
+
+
+def setup_worker():
+    django.setup()
+
+
+class HashingPool:
+    """Ограниченный пул для хеширования паролей.
+
+    Одновременно выполняется или ждет в очереди не больше
+    ``PASSWORD_HASHING_WORKERS + PASSWORD_HASHING_QUEUE`` задач; если
+    место не освободилось за ``PASSWORD_HASHING_WAIT`` секунд, запрос
+    сразу получает 503 вместо того, чтобы занимать обработчик.
+    Пул создается лениво, уже в процессе-обработчике после fork.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._slots is not None:
+                return
+            mode = settings.PASSWORD_HASHING_POOL
+            workers = settings.PASSWORD_HASHING_WORKERS
+            if mode == 'process':
+                self._executor = ProcessPoolExecutor(
+                    max_workers=workers, initializer=setup_worker)
+            elif mode == 'thread':
+                self._executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix='hashing')
+            self._slots = threading.BoundedSemaphore(
+                workers + settings.PASSWORD_HASHING_QUEUE)
+
+    def run(self, func, *args):
+        self._ensure_started()
+        if not self._slots.acquire(timeout=settings.PASSWORD_HASHING_WAIT):
+            raise HashingBusy()
+        try:
+            if self._executor is None:
+                return func(*args)
+            return self._executor.submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._slots = None
+
+
+hashing_pool = HashingPool()
+
+
+def hash_password(raw_password):
+    return hashing_pool.run(make_password, raw_password)
+
+
+def set_user_password(user, raw_password):
+    user.password = hash_password(raw_password)
+    user._password = raw_password
+
+
+def check_user_password(user, raw_password):
+    """Проверяет пароль в пуле; хеш по устаревшей политике
+    прозрачно пересчитывается и сохраняется.
+    """
+    is_correct, must_update = hashing_pool.run(
+        verify_password, raw_password, user.password)
+    if is_correct and must_update:
+        user.password = hash_password(raw_password)
+        user.save(update_fields=['password'])
+    return is_correct
+
+
+class PooledModelBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user_model = get_user_model()
+        if username is None:
+            username = kwargs.get(user_model.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = user_model._default_manager.get_by_natural_key(username)
+        except user_model.DoesNotExist:
+            # Выравнивает время ответа для несуществующего пользователя.
+            hash_password(password)
+            return None
+        if (check_user_password(user, password)
+                and self.user_can_authenticate(user)):
+            return user
+        return None
@@ -0,0 +1,316 @@
+import base64
+import csv
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import orjson
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, transaction
+from PIL import Image
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from users.models import CustomUser
+from .changes import record_changes
+from .ingredient_index import ingredient_index
+from .models import Change
+from .similarity import similarity_index
+from .tasks import cleanup_media_file
+from .versions import bump_table_version
+
+IMAGE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+
+class RowError(Exception):
+    pass
+
+
+def read_ndjson(stream):
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, orjson.loads(line)
+        except orjson.JSONDecodeError as error:
+            yield line_number, RowError(f'Некорректный JSON: {error}')
+
+
+def parse_csv_ingredients(value):
+    # Формат столбца: «название:единица:количество; ...».
+    items = []
+    for item in filter(None, (part.strip() for part in value.split(';'))):
+        try:
+            name, unit, amount = item.rsplit(':', 2)
+        except ValueError:
+            raise RowError(f'Некорректный ингредиент: {item}')
+        items.append({'name': name, 'measurement_unit': unit,
+                      'amount': amount})
+    return items
+
+
+def decode_lines(stream, bad_lines):
+    # Построчное декодирование: ошибка кодировки портит только свою
+    # строку, номера таких строк собираются в ``bad_lines``.
+    for line_number, line in enumerate(stream, start=1):
+        try:
+            yield line.decode('utf-8')
+        except UnicodeDecodeError:
+            bad_lines.add(line_number)
+            yield line.decode('utf-8', errors='replace')
+
+
+def read_csv(stream):
+    bad_lines = set()
+    reader = csv.DictReader(decode_lines(stream, bad_lines))
+    if reader.fieldnames is not None and bad_lines:
+        yield reader.line_num, RowError(
+            'Заголовок файла не в кодировке UTF-8')
+        return
+    previous = reader.line_num
+    for row in reader:
+        if bad_lines.intersection(range(previous + 1, reader.line_num + 1)):
+            row = RowError('Строка не в кодировке UTF-8')
+        else:
+            try:
+                row['ingredients'] = parse_csv_ingredients(
+                    row.get('ingredients') or '')
+            except RowError as error:
+                row = error
+        previous = reader.line_num
+        yield reader.line_num, row
+
+
+READERS = {'ndjson': read_ndjson, 'csv': read_csv}
+
+
+def store_image(value):
+    """Декодирует data URI, проверяет изображение и сохраняет файл.
+
+    Выполняется в пуле потоков: декодирование и проверка Pillow
+    не держат соединение с базой.
+    """
+    if not isinstance(value, str) or ';base64,' not in value:
+        raise RowError('Изображение должно быть data URI в base64')
+    try:
+        content = base64.b64decode(value.split(';base64,', 1)[1],
+                                   validate=True)
+        with Image.open(io.BytesIO(content)) as image:
+            image_format = image.format
+            image.verify()
+    # binascii.Error от b64decode — подкласс ValueError.
+    except (Image.DecompressionBombError, OSError, SyntaxError,
+            ValueError) as error:
+        raise RowError(f'Некорректное изображение: {error}')
+    extension = IMAGE_FORMATS.get(image_format)
+    if extension is None:
+        raise RowError(f'Неподдерживаемый формат изображения: {image_format}')
+    return default_storage.save(
+        f'{Recipe.image.field.upload_to}image.{extension}',
+        ContentFile(content))
+
+
+def positive_int(value, field):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{field}: ожидается целое число')
+    if number < 1:
+        raise RowError(f'{field}: значение должно быть не меньше 1')
+    return number
+
+
+class RecipeImporter:
+    """Пакетный импорт рецептов.
+
+    Ингредиенты сопоставляются по словарю «название, единица» → id,
+    изображения обрабатываются в пуле потоков, рецепты и ингредиенты
+    вставляются ``bulk_create`` по одной транзакции на пачку.
+    Ошибка в строке не прерывает импорт, а попадает в отчет.
+    """
+
+    def __init__(self, default_author=None, chunk_size=None, workers=None):
+        self.default_author = default_author
+        self.chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+        self.workers = workers or settings.IMPORT_IMAGE_WORKERS
+        self.ingredients = {}
+        self.ingredient_ids = set()
+        for pk, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'):
+            self.ingredients[(name.strip().lower(), unit.strip().lower())] = pk
+            self.ingredient_ids.add(pk)
+        self.authors = {}
+        self.rows = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < settings.IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def resolve_ingredient(self, item):
+        if not isinstance(item, dict):
+            raise RowError('Ингредиент должен быть объектом')
+        if 'id' in item:
+            ingredient_id = item['id']
+            if (not isinstance(ingredient_id, int)
+                    or isinstance(ingredient_id, bool)):
+                raise RowError('id ингредиента должен быть целым числом')
+            if ingredient_id not in self.ingredient_ids:
+                raise RowError(f'Ингредиент с id {ingredient_id} не найден')
+        else:
+            key = (str(item.get('name', '')).strip().lower(),
+                   str(item.get('measurement_unit', '')).strip().lower())
+            ingredient_id = self.ingredients.get(key)
+            if ingredient_id is None:
+                raise RowError(f'Ингредиент не найден: {key[0]} ({key[1]})')
+        return ingredient_id, positive_int(item.get('amount'), 'amount')
+
+    def prepare(self, row):
+        if isinstance(row, RowError):
+            raise row
+        if not isinstance(row, dict):
+            raise RowError('Строка должна быть объектом')
+        name = str(row.get('name') or '').strip()
+        text = str(row.get('text') or '').strip()
+        if not name or len(name) > 256:
+            raise RowError('name: обязательное поле до 256 символов')
+        if not text:
+            raise RowError('text: обязательное поле')
+        ingredients = row.get('ingredients')
+        if not ingredients or not isinstance(ingredients, list):
+            raise RowError('Необходимо указать хотя бы один ингредиент')
+        amounts = dict(self.resolve_ingredient(item) for item in ingredients)
+        if len(amounts) != len(ingredients):
+            raise RowError('Нельзя указывать один и тот же ингредиент '
+                           'несколько раз')
+        if not row.get('image'):
+            raise RowError('image: обязательное поле')
+        author = row.get('author')
+        if author is not None and not isinstance(author, str):
+            raise RowError('author: ожидается email')
+        return {
+            'author': author or self.default_author,
+            'name': name,
+            'text': text,
+            'cooking_time': positive_int(row.get('cooking_time'),
+                                         'cooking_time'),
+            'image': row['image'],
+            'ingredients': amounts,
+        }
+
+    def resolve_authors(self, prepared):
+        emails = {item['author'] for _, item in prepared
+                  if isinstance(item['author'], str)
+                  and item['author'] not in self.authors}
+        if emails:
+            self.authors.update(CustomUser.objects.filter(
+                email__in=emails, deleted_at__isnull=True
+            ).values_list('email', 'id'))
+        resolved = []
+        for line, item in prepared:
+            author = item['author']
+            if isinstance(author, CustomUser):
+                item['author_id'] = author.pk
+            elif author in self.authors:
+                item['author_id'] = self.authors[author]
+            else:
+                self.add_error(line, f'Автор не найден: {author}')
+                continue
+            resolved.append((line, item))
+        return resolved
+
+    def store_images(self, pool, prepared):
+        futures = [(line, item, pool.submit(store_image, item['image']))
+                   for line, item in prepared]
+        stored = []
+        for line, item, future in futures:
+            try:
+                item['image'] = future.result()
+            except RowError as error:
+                self.add_error(line, str(error))
+                continue
+            stored.append((line, item))
+        return stored
+
+    def insert(self, items):
+        recipes = Recipe.objects.bulk_create([
+            Recipe(author_id=item['author_id'], name=item['name'],
+                   text=item['text'], cooking_time=item['cooking_time'],
+                   image=item['image'])
+            for item in items
+        ])
+        links = RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe_id=recipe.pk, ingredient_id=ingredient_id,
+                             amount=amount)
+            for recipe, item in zip(recipes, items)
+            for ingredient_id, amount in item['ingredients'].items()
+        ])
+        pairs = [(recipe.pk, list(item['ingredients']))
+                 for recipe, item in zip(recipes, items)]
+        similarity_index.add_recipes(pairs)
+        record_changes(Recipe, Change.SAVE, ids=[r.pk for r in recipes])
+        record_changes(RecipeIngredient, Change.SAVE,
+                       ids=[link.pk for link in links])
+        transaction.on_commit(lambda: ingredient_index.add_recipes(pairs))
+        return len(recipes)
+
+    def import_chunk(self, pool, chunk):
+        prepared = []
+        for line, row in chunk:
+            try:
+                prepared.append((line, self.prepare(row)))
+            except RowError as error:
+                self.add_error(line, str(error))
+        prepared = self.store_images(pool, self.resolve_authors(prepared))
+        if not prepared:
+            return
+        try:
+            with transaction.atomic():
+                created = self.insert([item for _, item in prepared])
+        except DatabaseError:
+            # Пачка не прошла целиком: повторяем по одной строке,
+            # чтобы найти ошибочные и сохранить остальные.
+            created = 0
+            for line, item in prepared:
+                try:
+                    with transaction.atomic():
+                        created += self.insert([item])
+                except DatabaseError as error:
+                    self.add_error(line, f'Ошибка базы данных: {error}')
+                    cleanup_media_file.enqueue(
+                        item['image'],
+                        idempotency_key=f"cleanup-media:{item['image']}")
+        if created:
+            self.created += created
+            bump_table_version(Recipe._meta.db_table)
+            bump_table_version(RecipeIngredient._meta.db_table)
+
+    def run(self, rows, progress=None):
+        started = time.perf_counter()
+        rows = iter(rows)
+        with ThreadPoolExecutor(self.workers,
+                                thread_name_prefix='import') as pool:
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                self.rows += len(chunk)
+                self.import_chunk(pool, chunk)
+                if progress is not None:
+                    progress(self.report(time.perf_counter() - started))
+        return self.report(time.perf_counter() - started)
+
+    def report(self, elapsed):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'failed': self.error_count,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(self.rows / elapsed, 1) if elapsed else 0,
+            'errors': sorted(self.errors, key=lambda error: error['line']),
+        }
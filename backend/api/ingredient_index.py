@@ -0,0 +1,181 @@
+import bisect
+import heapq
+import threading
+import time
+from array import array
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from recipes.models import Recipe, RecipeIngredient
+from .versions import get_table_versions
+
+# Версии этих таблиц в общем кеше сообщают об изменениях, сделанных
+# другими процессами.
+INDEX_TABLES = (Recipe._meta.db_table, RecipeIngredient._meta.db_table)
+
+
+class IngredientIndex:
+    """Инвертированный индекс «ингредиент -> рецепты» в памяти процесса.
+
+    Списки рецептов хранятся отсортированными массивами ``array('I')``,
+    поиск выполняется слиянием этих списков с подсчетом совпадений.
+    При превышении ``max_entries`` индекс отключается, и поиск
+    выполняется агрегирующим SQL-запросом. Индекс перестраивается,
+    когда меняются общие версии ``INDEX_TABLES``, и не реже чем раз
+    в ``max_age`` секунд.
+    """
+
+    def __init__(self, max_entries, max_age):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._recipes = {}
+        self._entries = 0
+        self._built_at = None
+        self._versions = None
+        self._overflow = False
+
+    def build(self):
+        # Версии читаются до строк: изменение, сделанное во время
+        # чтения, вызовет еще одно перестроение.
+        versions = get_table_versions(INDEX_TABLES)
+        rows = (RecipeIngredient.objects
+                .filter(recipe__deleted_at__isnull=True)
+                .order_by('recipe_id', 'ingredient_id')
+                .values_list('recipe_id', 'ingredient_id')
+                .iterator(chunk_size=2000))
+        postings = {}
+        recipes = {}
+        entries = 0
+        overflow = False
+        for recipe_id, group in groupby(rows, key=itemgetter(0)):
+            ingredient_ids = array('I', (row[1] for row in group))
+            entries += len(ingredient_ids)
+            if entries > self.max_entries:
+                overflow = True
+                postings, recipes, entries = {}, {}, 0
+                break
+            recipes[recipe_id] = ingredient_ids
+            for ingredient_id in ingredient_ids:
+                postings.setdefault(ingredient_id, array('I')).append(
+                    recipe_id)
+        with self._lock:
+            self._postings = postings
+            self._recipes = recipes
+            self._entries = entries
+            self._overflow = overflow
+            self._versions = versions
+            self._built_at = time.monotonic()
+
+    def _ensure_built(self):
+        if (self._built_at is None
+                or time.monotonic() - self._built_at > self.max_age
+                or get_table_versions(INDEX_TABLES) != self._versions):
+            self.build()
+
+    def _add(self, recipe_id, ingredient_ids):
+        if self._entries + len(ingredient_ids) > self.max_entries:
+            self._postings, self._recipes, self._entries = {}, {}, 0
+            self._overflow = True
+            return
+        self._recipes[recipe_id] = array('I', ingredient_ids)
+        self._entries += len(ingredient_ids)
+        for ingredient_id in ingredient_ids:
+            posting = self._postings.setdefault(ingredient_id, array('I'))
+            posting.insert(bisect.bisect_left(posting, recipe_id), recipe_id)
+
+    def _remove(self, recipe_id):
+        ingredient_ids = self._recipes.pop(recipe_id, None)
+        if ingredient_ids is None:
+            return
+        self._entries -= len(ingredient_ids)
+        for ingredient_id in ingredient_ids:
+            posting = self._postings[ingredient_id]
+            position = bisect.bisect_left(posting, recipe_id)
+            if position < len(posting) and posting[position] == recipe_id:
+                del posting[position]
+            if not posting:
+                del self._postings[ingredient_id]
+
+    def refresh(self, recipe_id):
+        if self._built_at is None or self._overflow:
+            return
+        ingredient_ids = list(
+            RecipeIngredient.objects.filter(
+                recipe_id=recipe_id, recipe__deleted_at__isnull=True)
+            .order_by('ingredient_id')
+            .values_list('ingredient_id', flat=True)
+        )
+        with self._lock:
+            if self._overflow:
+                return
+            self._remove(recipe_id)
+            if ingredient_ids:
+                self._add(recipe_id, ingredient_ids)
+
+    def discard(self, recipe_ids):
+        """Убирает скрытые или удаленные рецепты без обращения к базе."""
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._remove(recipe_id)
+
+    def add_recipes(self, recipes):
+        """Добавляет новые рецепты без обращения к базе:
+        ``recipes`` — пары (id рецепта, id ингредиентов).
+        """
+        if self._built_at is None or self._overflow:
+            return
+        with self._lock:
+            for recipe_id, ingredient_ids in recipes:
+                if self._overflow:
+                    return
+                self._remove(recipe_id)
+                self._add(recipe_id, sorted(ingredient_ids))
+
+    def search(self, ingredient_ids, min_coverage):
+        ingredient_ids = set(ingredient_ids)
+        self._ensure_built()
+        with self._lock:
+            if not self._overflow:
+                return self._search_index(ingredient_ids, min_coverage)
+        return self._search_sql(ingredient_ids, min_coverage)
+
+    def _search_index(self, ingredient_ids, min_coverage):
+        streams = [self._postings[ingredient_id]
+                   for ingredient_id in ingredient_ids
+                   if ingredient_id in self._postings]
+        matches = []
+        for recipe_id, group in groupby(heapq.merge(*streams)):
+            matched = sum(1 for _ in group)
+            total = len(self._recipes[recipe_id])
+            if matched / total >= min_coverage:
+                matches.append((recipe_id, matched, total))
+        return self._rank(matches)
+
+    def _search_sql(self, ingredient_ids, min_coverage):
+        rows = (RecipeIngredient.objects
+                .filter(recipe__deleted_at__isnull=True)
+                .values('recipe_id')
+                .annotate(total=Count('id'),
+                          matched=Count('id', filter=Q(
+                              ingredient_id__in=ingredient_ids)))
+                .filter(matched__gt=0)
+                .values_list('recipe_id', 'matched', 'total'))
+        return self._rank([row for row in rows
+                           if row[1] / row[2] >= min_coverage])
+
+    @staticmethod
+    def _rank(matches):
+        matches.sort(key=lambda row: (-row[1] / row[2], -row[1], row[0]))
+        return [(recipe_id, round(matched / total, 4))
+                for recipe_id, matched, total in matches]
+
+
+ingredient_index = IngredientIndex(
+    max_entries=settings.INGREDIENT_INDEX_MAX_ENTRIES,
+    max_age=settings.INGREDIENT_INDEX_MAX_AGE,
+)
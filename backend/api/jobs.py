@@ -0,0 +1,143 @@
+import os
+import random
+import socket
+import threading
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Job
+
+registry = {}
+_local = threading.local()
+
+
+def task(func=None, *, name=None, max_attempts=None):
+    """Регистрирует функцию как фоновую задачу.
+
+    У функции появляется метод ``enqueue(*args, **kwargs)``.
+    Аргументы должны сериализоваться в JSON.
+    """
+
+    def decorator(func):
+        func.task_name = name or f'{func.__module__}.{func.__name__}'
+        func.max_attempts = max_attempts or settings.JOBS_MAX_ATTEMPTS
+        func.enqueue = (
+            lambda *args, **kwargs: enqueue(func, *args, **kwargs))
+        registry[func.task_name] = func
+        return func
+
+    return decorator(func) if func else decorator
+
+
+def enqueue(func, *args, idempotency_key=None, delay=None, **kwargs):
+    # Задача записывается в текущей транзакции вызывающего кода:
+    # обработчики увидят ее только после коммита, а при откате
+    # она исчезнет вместе с остальными изменениями.
+    fields = {
+        'task': func.task_name,
+        'args': list(args),
+        'kwargs': kwargs,
+        'max_attempts': func.max_attempts,
+        'run_at': timezone.now() + (delay or timedelta()),
+        'idempotency_key': idempotency_key,
+    }
+    if idempotency_key is None:
+        return Job.objects.create(**fields)
+    active = Job.objects.filter(idempotency_key=idempotency_key,
+                                status__in=Job.ACTIVE_STATUSES)
+    existing = active.first()
+    if existing is not None:
+        return existing
+    try:
+        with transaction.atomic():
+            return Job.objects.create(**fields)
+    except IntegrityError:
+        return active.first()
+
+
+def report_progress(**values):
+    """Сохраняет ход выполнения текущей задачи в ``Job.progress``."""
+    job_id = getattr(_local, 'job_id', None)
+    if job_id is not None:
+        Job.objects.filter(id=job_id).update(progress=values)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'[:55]
+
+
+def claim_jobs(limit):
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    ready = (Q(status=Job.PENDING, run_at__lte=now)
+             | Q(status=Job.RUNNING, locked_at__lt=stale))
+    token = f'{worker_name()}:{uuid.uuid4().hex[:8]}'
+    with transaction.atomic():
+        candidates = Job.objects.filter(ready).order_by('run_at')
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        # Условие повторяется в UPDATE: без SKIP LOCKED (SQLite)
+        # задачу получит только один обработчик.
+        Job.objects.filter(ready, id__in=ids).update(
+            status=Job.RUNNING, locked_at=now, locked_by=token)
+    return list(Job.objects.filter(locked_by=token, status=Job.RUNNING))
+
+
+def backoff(attempts):
+    delay = min(settings.JOBS_BACKOFF_BASE * 2 ** (attempts - 1),
+                settings.JOBS_BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def execute(job):
+    autodiscover_modules('tasks')
+    owned = Job.objects.filter(id=job.id, locked_by=job.locked_by)
+    attempts = job.attempts + 1
+    try:
+        func = registry.get(job.task)
+        if func is None:
+            raise LookupError(f'Неизвестная задача: {job.task}')
+        _local.job_id = job.id
+        func(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if attempts < job.max_attempts:
+            owned.update(status=Job.PENDING, attempts=attempts,
+                         run_at=timezone.now() + backoff(attempts),
+                         last_error=error, locked_at=None, locked_by='')
+        else:
+            owned.update(status=Job.FAILED, attempts=attempts,
+                         last_error=error, finished_at=timezone.now())
+        return False
+    finally:
+        _local.job_id = None
+    owned.update(status=Job.DONE, attempts=attempts,
+                 finished_at=timezone.now())
+    return True
+
+
+def run_job(job_id):
+    close_old_connections()
+    try:
+        job = Job.objects.filter(id=job_id).first()
+        return execute(job) if job is not None else False
+    finally:
+        close_old_connections()
+
+
+def prune_finished_jobs():
+    threshold = timezone.now() - timedelta(days=settings.JOBS_RETENTION_DAYS)
+    deleted, _ = Job.objects.filter(status=Job.DONE,
+                                    finished_at__lt=threshold).delete()
+    return deleted
@@ -0,0 +1,77 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from api.hashing import hash_password, hashing_pool
+from users.models import CustomUser
+
+PASSWORD = 'bench-auth-Password-42'
+
+
+class Command(BaseCommand):
+    help = "Замер пропускной способности входа по токену под нагрузкой"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--pool', choices=['thread', 'process', 'inline'],
+                            default=settings.PASSWORD_HASHING_POOL)
+
+    def login(self, email):
+        close_old_connections()
+        client = Client()
+        started = time.perf_counter()
+        response = client.post('/api/auth/token/login/',
+                               {'email': email, 'password': PASSWORD})
+        return response.status_code, time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        rates = {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'],
+                 'auth': None}
+        overrides = override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            PASSWORD_HASHING_POOL=options['pool'],
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK,
+                            'DEFAULT_THROTTLE_RATES': rates},
+        )
+        hashing_pool.shutdown()
+        with overrides:
+            encoded = hash_password(PASSWORD)
+            users = CustomUser.objects.bulk_create(
+                CustomUser(email=f'bench-auth-{i}@example.com',
+                           username=f'bench-auth-{i}', first_name='bench',
+                           last_name='auth', password=encoded)
+                for i in range(options['users']))
+            emails = [user.email for user in users]
+            try:
+                started = time.perf_counter()
+                with ThreadPoolExecutor(options['concurrency']) as executor:
+                    results = list(executor.map(
+                        self.login,
+                        (emails[i % len(emails)]
+                         for i in range(options['requests']))))
+                elapsed = time.perf_counter() - started
+            finally:
+                Token.objects.filter(user__in=users).delete()
+                CustomUser.objects.filter(
+                    id__in=[user.id for user in users]).delete()
+                hashing_pool.shutdown()
+        latencies = sorted(latency for _, latency in results)
+        codes = {}
+        for code, _ in results:
+            codes[code] = codes.get(code, 0) + 1
+        self.stdout.write(
+            f"Пул: {options['pool']}, хешер: {settings.PASSWORD_HASHER}, "
+            f"потоков клиента: {options['concurrency']}")
+        self.stdout.write(
+            f"{len(results) / elapsed:.1f} входов/с, "
+            f"p50 {statistics.median(latencies) * 1000:.1f} мс, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} мс")
+        self.stdout.write(self.style.SUCCESS(f"Ответы: {codes}"))
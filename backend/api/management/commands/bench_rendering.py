@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.middleware import brotli, compress
+from api.renderers import ORJSONRenderer
+from api.serializers import RecipeSerializer
+from recipes.models import Recipe
+
+
+def measure(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+class Command(BaseCommand):
+    help = "Замер рендеринга и сжатия страницы списка рецептов"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=60)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        request = Request(RequestFactory().get('/api/recipes/'))
+        queryset = RecipeSerializer.optimize_queryset(
+            Recipe.objects.order_by('-pub_date'), request
+        )[:options['page_size']]
+        data = {
+            'count': len(queryset), 'next': None, 'previous': None,
+            'results': RecipeSerializer(
+                queryset, many=True, context={'request': request}).data,
+        }
+        repeat = options['repeat']
+        rows = []
+        for renderer in (JSONRenderer(), ORJSONRenderer()):
+            elapsed, body = measure(lambda: renderer.render(data), repeat)
+            rows.append((type(renderer).__name__, elapsed, len(body)))
+        encodings = ['gzip'] + (['br'] if brotli else [])
+        for encoding in encodings:
+            elapsed, compressed = measure(
+                lambda: compress(body, encoding), repeat)
+            rows.append((encoding, elapsed, len(compressed)))
+        self.stdout.write(f"Рецептов на странице: {len(data['results'])}")
+        for name, elapsed, size in rows:
+            self.stdout.write(f"{name:<16} {elapsed:8.3f} мс {size:>9} байт")
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from api.throttling import AutocompleteThrottle
+
+
+class Command(BaseCommand):
+    help = "Замер накладных расходов на проверку ограничения частоты"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=20000)
+        parser.add_argument('--clients', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        requests = [
+            Request(factory.get('/api/ingredients/',
+                                REMOTE_ADDR=f'10.0.{i // 256}.{i % 256}'))
+            for i in range(options['clients'])
+        ]
+        throttle = AutocompleteThrottle()
+        checks = options['checks']
+        started = time.perf_counter()
+        for i in range(checks):
+            throttle.allow_request(requests[i % len(requests)], None)
+        elapsed = (time.perf_counter() - started) / checks * 1_000_000
+        self.stdout.write(
+            f"Проверок: {checks}, клиентов: {len(requests)}, "
+            f"{elapsed:.1f} мкс на проверку")
@@ -0,0 +1,40 @@
+import posixpath
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.storage import count_references
+
+MEDIA_DIRECTORIES = ('recipes/images', 'users/avatars')
+
+
+class Command(BaseCommand):
+    help = "Удаление файлов медиа, на которые не ссылается ни одна запись"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        removed = 0
+        for directory in MEDIA_DIRECTORIES:
+            if not default_storage.exists(directory):
+                continue
+            _, files = default_storage.listdir(directory)
+            for filename in files:
+                name = posixpath.join(directory, filename)
+                if count_references(name):
+                    continue
+                if options['dry_run']:
+                    age = timezone.now() - default_storage.get_modified_time(
+                        name)
+                    if age.total_seconds() < settings.MEDIA_ORPHAN_GRACE:
+                        continue
+                elif default_storage.delete_unless_recent(
+                        name, settings.MEDIA_ORPHAN_GRACE):
+                    continue
+                removed += 1
+        self.stdout.write(
+            self.style.SUCCESS(f"Файлов без ссылок: {removed}")
+        )
@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.changes import (current_cursor, iter_changes, iter_snapshot, ndjson,
+                         parse_models)
+
+
+class Command(BaseCommand):
+    help = ("Выгрузка изменений рецептов, избранного, списков покупок "
+            "и подписок в NDJSON начиная с курсора; без курсора — "
+            "полный снимок")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cursor', type=int)
+        parser.add_argument('--models', default='',
+                            help='Например: recipes.recipe,recipes.favorite')
+        parser.add_argument('--output', help='Файл; по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        try:
+            models = parse_models(options['models'])
+        except ValueError as error:
+            raise CommandError(f"Неизвестные модели: {error}")
+        upper = current_cursor()
+        if options['cursor'] is None:
+            records = iter_snapshot(models)
+        else:
+            records = iter_changes(options['cursor'], upper, models)
+        output = (open(options['output'], 'wb') if options['output']
+                  else sys.stdout.buffer)
+        try:
+            for line in ndjson(records, upper):
+                output.write(line)
+        finally:
+            if options['output']:
+                output.close()
+            else:
+                output.flush()
+        self.stderr.write(self.style.SUCCESS(f"Следующий курсор: {upper}"))
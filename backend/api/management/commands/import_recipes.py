@@ -0,0 +1,52 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importer import READERS, RecipeImporter
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = ("Пакетный импорт рецептов из NDJSON или CSV "
+            "(столбец ingredients: «название:единица:количество; ...»)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или «-» для stdin')
+        parser.add_argument('--format', choices=READERS)
+        parser.add_argument('--author',
+                            help='Email автора для строк без author')
+        parser.add_argument('--chunk-size', type=int)
+        parser.add_argument('--workers', type=int)
+
+    def progress(self, report):
+        self.stderr.write(
+            f"Обработано {report['rows']}, создано {report['created']}, "
+            f"ошибок {report['failed']}, {report['rows_per_second']} строк/с")
+
+    def handle(self, *args, **options):
+        author = None
+        if options['author']:
+            author = CustomUser.objects.filter(
+                email=options['author']).first()
+            if author is None:
+                raise CommandError(f"Автор не найден: {options['author']}")
+        path = options['path']
+        input_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'ndjson')
+        importer = RecipeImporter(default_author=author,
+                                  chunk_size=options['chunk_size'],
+                                  workers=options['workers'])
+        stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        try:
+            report = importer.run(READERS[input_format](stream),
+                                  progress=self.progress)
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+        for error in report['errors']:
+            self.stderr.write(
+                self.style.ERROR(f"Строка {error['line']}: {error['error']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Строк: {report['rows']}, создано рецептов: {report['created']}, "
+            f"ошибок: {report['failed']}, {report['seconds']} с "
+            f"({report['rows_per_second']} строк/с)"))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.similarity import similarity_index
+
+
+class Command(BaseCommand):
+    help = "Пересчет MinHash-сигнатур всех рецептов для поиска похожих"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = similarity_index.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Пересчитано сигнатур: {total} "
+                f"за {time.monotonic() - started:.1f} с")
+        )
@@ -0,0 +1,63 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils.module_loading import autodiscover_modules
+
+from api.jobs import claim_jobs, prune_finished_jobs, run_job
+
+
+def init_process():
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Запуск обработчиков фоновых задач из очереди в базе данных"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=settings.JOBS_WORKERS)
+        parser.add_argument('--mode', choices=('thread', 'process'),
+                            default='thread')
+        parser.add_argument('--poll-interval', type=float,
+                            default=settings.JOBS_POLL_INTERVAL)
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи и завершиться')
+
+    def handle(self, *args, **options):
+        autodiscover_modules('tasks')
+        workers = options['workers']
+        if options['mode'] == 'process':
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=workers,
+                                       initializer=init_process)
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers)
+        self.stdout.write(
+            f"Обработчиков: {workers} ({options['mode']})")
+        running = set()
+        pruned_at = 0
+        try:
+            while True:
+                running = {future for future in running
+                           if not future.done()}
+                jobs = []
+                if len(running) < workers:
+                    jobs = claim_jobs(workers - len(running))
+                for job in jobs:
+                    running.add(pool.submit(run_job, job.id))
+                if time.monotonic() - pruned_at > 3600:
+                    prune_finished_jobs()
+                    pruned_at = time.monotonic()
+                if options['once'] and not jobs and not running:
+                    break
+                if not jobs:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Остановка: ждем завершения задач")
+        finally:
+            pool.shutdown(wait=True)
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from api.models import SlowQuery
+
+ORDERINGS = {
+    'total': '-total_time',
+    'count': '-count',
+    'max': '-max_time',
+    'avg': '-avg_time',
+}
+
+
+class Command(BaseCommand):
+    help = "Самые медленные запросы к базе по отпечатку"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--order', choices=ORDERINGS, default='total')
+        parser.add_argument('--plans', action='store_true',
+                            help='Показать планы выполнения')
+        parser.add_argument('--reset', action='store_true',
+                            help='Очистить журнал')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            deleted, _ = SlowQuery.objects.all().delete()
+            self.stdout.write(
+                self.style.SUCCESS(f"Удалено записей: {deleted}"))
+            return
+        queries = SlowQuery.objects.annotate(
+            avg_time=F('total_time') / F('count')
+        ).order_by(ORDERINGS[options['order']])[:options['limit']]
+        for query in queries:
+            self.stdout.write(
+                f"{query.total_time:10.1f} мс  {query.count:6d} раз  "
+                f"ср. {query.avg_time:8.1f}  макс. {query.max_time:8.1f}  "
+                f"{query.caller or '—'}"
+            )
+            self.stdout.write(f"    {query.sql[:300]}")
+            if options['plans'] and query.plan:
+                for line in query.plan.splitlines():
+                    self.stdout.write(f"        {line}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Отпечатков в журнале: {SlowQuery.objects.count()}"))
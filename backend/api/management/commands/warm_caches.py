@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = ("Прогрев справочника ингредиентов, горячих рецептов "
+            "и общего кеша перед переключением трафика")
+
+    def handle(self, *args, **options):
+        report = warm_up.run()
+        for step, elapsed in report.items():
+            self.stdout.write(f'{step}: {elapsed} мс')
+        self.stdout.write(self.style.SUCCESS(
+            f'Прогрев завершен за {sum(report.values()):.1f} мс'))
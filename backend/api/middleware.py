@@ -0,0 +1,89 @@
+import gzip
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# HTML не сжимается: в нем есть CSRF-токены (атака BREACH).
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson',
+                      'text/plain', 'text/csv')
+re_accepts = _lazy_re_compile(r'([\w*]+)\s*(?:;\s*q=([0-9.]+))?')
+
+
+def accepted_encodings(request):
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    encodings = {}
+    for encoding, quality in re_accepts.findall(header.lower()):
+        try:
+            encodings[encoding] = float(quality) if quality else 1.0
+        except ValueError:
+            continue
+    return encodings
+
+
+def choose_encoding(request, available):
+    encodings = accepted_encodings(request)
+    ranked = sorted(
+        ((encodings.get(encoding, encodings.get('*', 0)), -position,
+          encoding) for position, encoding in enumerate(available)),
+        reverse=True)
+    if ranked and ranked[0][0] > 0:
+        return ranked[0][2]
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(
+            body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(
+        body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """Сжатие ответов brotli или gzip по заголовку Accept-Encoding.
+
+    Ответ может заранее содержать сжатые варианты тела в атрибуте
+    ``precompressed`` (словарь ``{'br': bytes, 'gzip': bytes}``) —
+    тогда они отдаются без повторного сжатия.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.encodings = ('br', 'gzip') if brotli else ('gzip',)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.streaming or response.has_header('Content-Encoding')
+                or not response.get('Content-Type', '').startswith(
+                    COMPRESSIBLE_TYPES)):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        precompressed = getattr(response, 'precompressed', None) or {}
+        available = [encoding for encoding in self.encodings
+                     if encoding in precompressed
+                     or len(response.content)
+                     >= settings.COMPRESSION_MIN_SIZE]
+        encoding = choose_encoding(request, available)
+        if encoding is None:
+            return response
+        body = precompressed.get(encoding)
+        if body is None:
+            body = compress(response.content, encoding)
+            if len(body) >= len(response.content):
+                return response
+        response.content = body
+        response['Content-Length'] = str(len(body))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            if encoding in precompressed:
+                response['ETag'] = f'{etag[:-1]}-{encoding}"'
+            else:
+                response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,158 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    ]
+    ACTIVE_STATUSES = (PENDING, RUNNING)
+
+    task = models.CharField(
+        max_length=255,
+        verbose_name='Задача',
+        help_text='Имя зарегистрированной задачи'
+    )
+    args = models.JSONField(default=list, verbose_name='Аргументы')
+    kwargs = models.JSONField(default=dict,
+                              verbose_name='Именованные аргументы')
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveIntegerField(default=0,
+                                           verbose_name='Попыток')
+    max_attempts = models.PositiveIntegerField(
+        default=5, verbose_name='Максимум попыток')
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Запустить после'
+    )
+    locked_at = models.DateTimeField(null=True, blank=True,
+                                     verbose_name='Взята в работу')
+    locked_by = models.CharField(max_length=64, blank=True,
+                                 verbose_name='Обработчик')
+    last_error = models.TextField(blank=True,
+                                  verbose_name='Последняя ошибка')
+    progress = models.JSONField(default=dict, blank=True,
+                                verbose_name='Ход выполнения')
+    idempotency_key = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        verbose_name='Ключ идемпотентности',
+        help_text='Пока задача с таким ключом не завершена, '
+                  'повторная постановка вернет ее же'
+    )
+    created_at = models.DateTimeField(auto_now_add=True,
+                                      verbose_name='Создана')
+    finished_at = models.DateTimeField(null=True, blank=True,
+                                       verbose_name='Завершена')
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['idempotency_key'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_idempotency_key'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_at'],
+                         name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} ({self.get_status_display()})"
+
+
+class SlowQuery(models.Model):
+    fingerprint = models.CharField(
+        max_length=40,
+        unique=True,
+        verbose_name='Отпечаток',
+        help_text='Хеш текста запроса без значений параметров'
+    )
+    sql = models.TextField(verbose_name='Запрос')
+    caller = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='Источник',
+        help_text='Представление или метод сериализатора'
+    )
+    plan = models.TextField(blank=True, verbose_name='План выполнения')
+    count = models.PositiveIntegerField(default=0,
+                                        verbose_name='Количество')
+    total_time = models.FloatField(default=0,
+                                   verbose_name='Суммарное время, мс')
+    max_time = models.FloatField(default=0,
+                                 verbose_name='Максимальное время, мс')
+    first_seen = models.DateTimeField(auto_now_add=True,
+                                      verbose_name='Впервые')
+    last_seen = models.DateTimeField(default=timezone.now,
+                                     verbose_name='Последний раз')
+
+    class Meta:
+        verbose_name = 'Медленный запрос'
+        verbose_name_plural = 'Медленные запросы'
+        ordering = ['-total_time']
+
+    def __str__(self):
+        return f"{self.caller or self.fingerprint} ({self.count})"
+
+
+class Change(models.Model):
+    SAVE = 'save'
+    DELETE = 'delete'
+    OPERATION_CHOICES = [
+        (SAVE, 'Создание или изменение'),
+        (DELETE, 'Удаление'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(
+        max_length=64,
+        verbose_name='Модель',
+        help_text='app_label.model_name измененной записи'
+    )
+    object_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Id записи'
+    )
+    operation = models.CharField(
+        max_length=8,
+        choices=OPERATION_CHOICES,
+        verbose_name='Операция'
+    )
+    key = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Ключ',
+        help_text='Естественный ключ удаленной записи'
+    )
+    created_at = models.DateTimeField(auto_now_add=True,
+                                      verbose_name='Время изменения')
+
+    class Meta:
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Журнал изменений'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['model', 'id'], name='change_model_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.id}: {self.operation} {self.model} {self.object_id}"
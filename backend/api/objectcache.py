@@ -0,0 +1,177 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+
+from recipes.models import Recipe
+from users.models import CustomUser
+
+
+class LocalLRU:
+    """Ограниченный LRU-кеш процесса с коротким временем жизни записей.
+
+    Другие процессы узнают об инвалидации только из общего кеша,
+    поэтому локальная запись живет не дольше ``ttl`` секунд.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, payload = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def set(self, key, payload):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class ObjectCache:
+    """Кеш объектов по первичному ключу: LRU процесса перед общим кешем.
+
+    Объекты хранятся сериализованными: каждый вызов получает свою копию
+    и может ее изменять. Ключ содержит отпечаток полей модели
+    и ``OBJECT_CACHE_VERSION``, поэтому после изменения схемы
+    старые записи не читаются.
+    """
+
+    def __init__(self, model, queryset=None, related=None):
+        self.model = model
+        self._queryset = queryset
+        self.related = related or {}
+        self.local = LocalLRU(settings.OBJECT_CACHE_LOCAL_SIZE,
+                              settings.OBJECT_CACHE_LOCAL_TTL)
+        self._prefix = None
+
+    @property
+    def prefix(self):
+        if self._prefix is None:
+            fields = ','.join(field.attname for field
+                              in self.model._meta.concrete_fields)
+            stamp = hashlib.md5(fields.encode()).hexdigest()[:8]
+            self._prefix = (f'objcache:{self.model._meta.label_lower}:'
+                            f'{settings.OBJECT_CACHE_VERSION}:{stamp}')
+        return self._prefix
+
+    def key(self, pk):
+        return f'{self.prefix}:{pk}'
+
+    def queryset(self):
+        if self._queryset is not None:
+            return self._queryset()
+        return self.model._default_manager.all()
+
+    def _attach_related(self, instances):
+        for field, related_cache in self.related.items():
+            attname = self.model._meta.get_field(field).attname
+            related = related_cache.get_many(
+                {getattr(instance, attname) for instance in instances})
+            for instance in instances:
+                value = related.get(getattr(instance, attname))
+                if value is not None:
+                    setattr(instance, field, value)
+        return instances
+
+    def _load(self, pks):
+        payloads = {}
+        for instance in self.queryset().filter(pk__in=pks):
+            payloads[instance.pk] = pickle.dumps(instance,
+                                                 pickle.HIGHEST_PROTOCOL)
+        for pk, payload in payloads.items():
+            self.local.set(self.key(pk), payload)
+        if payloads:
+            cache.set_many({self.key(pk): payload
+                            for pk, payload in payloads.items()},
+                           settings.OBJECT_CACHE_TIMEOUT)
+        return payloads
+
+    def get_many(self, pks):
+        pks = {int(pk) for pk in pks}
+        payloads = {}
+        missing = []
+        for pk in pks:
+            payload = self.local.get(self.key(pk))
+            if payload is None:
+                missing.append(pk)
+            else:
+                payloads[pk] = payload
+        if missing:
+            shared = cache.get_many([self.key(pk) for pk in missing])
+            to_load = []
+            for pk in missing:
+                payload = shared.get(self.key(pk))
+                if payload is None:
+                    to_load.append(pk)
+                else:
+                    payloads[pk] = payload
+                    self.local.set(self.key(pk), payload)
+            if to_load:
+                payloads.update(self._load(to_load))
+        instances = {pk: pickle.loads(payload)
+                     for pk, payload in payloads.items()}
+        self._attach_related(list(instances.values()))
+        return instances
+
+    def get(self, pk):
+        return self.get_many([pk]).get(int(pk))
+
+    def get_or_404(self, pk):
+        instance = self.get(pk)
+        if instance is None:
+            raise Http404(
+                f'{self.model._meta.verbose_name.capitalize()} не найден')
+        return instance
+
+    def invalidate(self, *pks):
+        keys = [self.key(pk) for pk in pks]
+
+        def delete():
+            for key in keys:
+                self.local.delete(key)
+            cache.delete_many(keys)
+
+        # Повторное удаление после коммита не дает параллельному
+        # запросу закешировать еще не зафиксированное состояние.
+        delete()
+        transaction.on_commit(delete)
+
+
+user_cache = ObjectCache(
+    CustomUser,
+    queryset=lambda: CustomUser.objects.filter(
+        deleted_at__isnull=True).defer('password'),
+)
+recipe_cache = ObjectCache(
+    Recipe,
+    queryset=lambda: Recipe.objects.prefetch_related(
+        'recipe_ingredients__ingredient'),
+    related={'author': user_cache},
+)
@@ -1,7 +1,124 @@
+import hashlib
+import json
+
+from django.apps import apps
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
 from rest_framework.pagination import PageNumberPagination
 
+from .singleflight import SingleFlight
+from .versions import get_table_versions
+
+counts = SingleFlight('count', settings.PAGINATION_COUNT_TIMEOUT)
+
 
 class CustomPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
     max_page_size = 60
+
+
+def walk(node):
+    yield node
+    children = getattr(node, 'children', None)
+    if children is None and hasattr(node, 'get_source_expressions'):
+        children = node.get_source_expressions()
+    for child in children or ():
+        yield from walk(child)
+
+
+def count_queryset(queryset):
+    """Копия запроса только для подсчета строк: без сортировки,
+    ``select_related`` и аннотаций, которые не участвуют в фильтрах.
+
+    Так один ключ COUNT(*) достается всем пользователям, а записи
+    в таблицы, нужные только для вывода, его не сбрасывают.
+    """
+    query = queryset.query.chain()
+    query.clear_ordering(force=True)
+    query.select_related = False
+    # Фильтры по агрегатам и DISTINCT зависят от аннотаций и GROUP BY,
+    # такие запросы считаются как есть.
+    if not (query.where.contains_aggregate or query.distinct
+            or query.combinator):
+        query.annotations = {}
+        query.set_annotation_mask(())
+        query.group_by = None
+        # Соединения, нужные только снятым аннотациям, тоже убираются:
+        # иначе LEFT JOIN размножит строки.
+        used = {query.get_initial_alias()}
+        for node in walk(query.where):
+            alias = getattr(node, 'alias', None)
+            while alias in query.alias_map and alias not in used:
+                used.add(alias)
+                alias = getattr(query.alias_map[alias], 'parent_alias', None)
+        for alias in query.alias_map:
+            if alias not in used:
+                query.alias_refcount[alias] = 0
+    clone = queryset._chain()
+    clone.query = query
+    return clone.values('pk')
+
+
+class CachedCountPaginator(Paginator):
+    """Кеширует COUNT(*) по SQL запроса и версиям задействованных таблиц.
+
+    Для больших выборок в PostgreSQL вместо точного подсчета
+    берется оценка планировщика из EXPLAIN.
+    """
+
+    approximate = False
+
+    def _cache_key(self, connection, sql, params):
+        tables = sorted(
+            model._meta.db_table for model in apps.get_models()
+            if connection.ops.quote_name(model._meta.db_table) in sql
+        )
+        signature = json.dumps([sql, [str(param) for param in params]])
+        # Версии таблиц не входят в ключ, а хранятся рядом со значением:
+        # после изменения данных старый COUNT отдается, пока один
+        # запрос пересчитывает новый.
+        return (hashlib.md5(signature.encode()).hexdigest(),
+                get_table_versions(tables))
+
+    def _estimate(self, connection, sql, params):
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        queryset = count_queryset(self.object_list)
+        connection = connections[queryset.db]
+        sql, params = queryset.query.sql_with_params()
+        key, version = self._cache_key(connection, sql, params)
+
+        def compute():
+            count = self._estimate(connection, sql, params)
+            if (count is not None
+                    and count > settings.PAGINATION_APPROXIMATE_THRESHOLD):
+                return True, count
+            return False, queryset.count()
+
+        self.approximate, count = counts.get(key, compute, version)
+        return count
+
+
+class CachedCountPagination(CustomPagination):
+    django_paginator_class = CachedCountPaginator
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.page.paginator.approximate:
+            response.data['count_is_approximate'] = True
+        return response
@@ -0,0 +1,120 @@
+import heapq
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from recipes.models import RecipeEngagement
+
+WINDOWS = {
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+    'all': None,
+}
+
+
+def current_bucket():
+    return timezone.now().replace(minute=0, second=0, microsecond=0)
+
+
+def record_engagement(recipe_id, field):
+    bucket = current_bucket()
+    counters = RecipeEngagement.objects.filter(recipe_id=recipe_id,
+                                               bucket=bucket)
+    if counters.update(**{field: F(field) + 1}):
+        return
+    try:
+        with transaction.atomic():
+            RecipeEngagement.objects.create(
+                recipe_id=recipe_id, bucket=bucket, **{field: 1})
+    except IntegrityError:
+        counters.update(**{field: F(field) + 1})
+
+
+def bucket_scores(**lookups):
+    return (RecipeEngagement.objects.filter(**lookups)
+            .values('recipe_id')
+            .annotate(score=Sum(F('favorites') + F('carts')))
+            .values_list('recipe_id', 'score'))
+
+
+class Leaderboard:
+    """Сумма активности по завершенным часам окна, обновляемая сдвигом.
+
+    При каждом пересчете читаются только часы, вошедшие в окно или
+    выпавшие из него с прошлого раза, и текущий незавершенный час.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._lock = threading.Lock()
+        self._totals = Counter()
+        self._start = None
+        self._end = None
+
+    def _advance(self, now):
+        start = now - self.window if self.window else None
+        if self._end is None:
+            lookups = {'bucket__lt': now}
+            if start is not None:
+                lookups['bucket__gte'] = start
+            self._totals = Counter(dict(bucket_scores(**lookups)))
+        else:
+            if self._end < now:
+                self._totals.update(dict(bucket_scores(
+                    bucket__gte=self._end, bucket__lt=now)))
+            if start is not None and self._start < start:
+                self._totals.subtract(dict(bucket_scores(
+                    bucket__gte=self._start, bucket__lt=start)))
+                for recipe_id in [recipe_id for recipe_id, score
+                                  in self._totals.items() if score <= 0]:
+                    del self._totals[recipe_id]
+        self._start = start
+        self._end = now
+
+    def discard(self, recipe_ids):
+        # Скрытый или удаленный рецепт убирается из сумм: без этого
+        # в окне «all» он оставался бы в них навсегда. Если его часы
+        # позже выпадут из окна, сумма уйдет в минус и тоже удалится.
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._totals.pop(recipe_id, None)
+
+    def top(self, size):
+        now = current_bucket()
+        current = dict(bucket_scores(bucket=now))
+        with self._lock:
+            self._advance(now)
+            totals = self._totals
+            candidates = set(totals) | set(current)
+            return [
+                (recipe_id, totals.get(recipe_id, 0)
+                 + current.get(recipe_id, 0))
+                for recipe_id in heapq.nlargest(
+                    size, candidates,
+                    key=lambda recipe_id: (
+                        totals.get(recipe_id, 0)
+                        + current.get(recipe_id, 0), -recipe_id))
+            ]
+
+
+leaderboards = {window: Leaderboard(period)
+                for window, period in WINDOWS.items()}
+
+
+def popular_recipes(window):
+    return cache.get_or_set(
+        f'popular-recipes:{window}',
+        lambda: leaderboards[window].top(settings.POPULAR_RECIPES_TOP),
+        settings.POPULAR_RECIPES_STALENESS,
+    )
+
+
+def discard_popular(recipe_ids):
+    for leaderboard in leaderboards.values():
+        leaderboard.discard(recipe_ids)
@@ -0,0 +1,150 @@
+import cProfile
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+SIGNING_SALT = 'api.profiling'
+# Без «.», «..» и скрытых файлов.
+SAFE_NAME = re.compile(r'^(?!\.)[\w.-]+$')
+EXTENSIONS = {'cprofile': '.prof', 'sampler': '.folded'}
+
+
+def profiles_root():
+    return Path(settings.PROFILING_DIR)
+
+
+def profile_path(url_name, filename):
+    """Путь к сохраненному профилю или None, если имя небезопасно,
+    путь выходит за ``PROFILING_DIR`` или файла нет.
+    """
+    if not (SAFE_NAME.match(url_name) and SAFE_NAME.match(filename)):
+        return None
+    root = profiles_root().resolve()
+    path = (root / url_name / filename).resolve()
+    if not path.is_relative_to(root) or not path.is_file():
+        return None
+    return path
+
+
+def make_profile_token():
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign('profile')
+
+
+def has_valid_token(request):
+    token = request.META.get(PROFILE_HEADER)
+    if not token:
+        return False
+    try:
+        signing.TimestampSigner(salt=SIGNING_SALT).unsign(
+            token, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+class StackSampler:
+    """Статистический профилировщик: раз в ``interval`` секунд снимает
+    стек профилируемого потока и считает одинаковые стеки.
+    Результат — формат collapsed stacks для flamegraph.pl/speedscope.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+
+    def _sample(self, thread_id):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} '
+                             f'({Path(code.co_filename).name}:'
+                             f'{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._sample, args=(threading.get_ident(),), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        path.write_text(''.join(f'{stack} {count}\n'
+                                for stack, count in self.stacks.items()))
+
+
+def rotate(directory):
+    files = sorted(directory.iterdir(), key=lambda item: item.stat().st_mtime)
+    for stale in files[:-settings.PROFILING_MAX_FILES]:
+        stale.unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """Профилирует долю запросов или запросы с подписанным заголовком
+    ``X-Profile`` и сохраняет профили по имени URL с ротацией.
+    При ``PROFILING_ENABLED = False`` не подключается вовсе.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.mode = settings.PROFILING_MODE
+
+    def should_profile(self, request):
+        return (random.random() < settings.PROFILING_SAMPLE_RATE
+                or has_valid_token(request))
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        if self.mode == 'sampler':
+            profiler = StackSampler(settings.PROFILING_SAMPLER_INTERVAL)
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            if self.mode == 'sampler':
+                profiler.stop()
+            else:
+                profiler.disable()
+        self.save(request, profiler, elapsed)
+        return response
+
+    def save(self, request, profiler, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        url_name = (match.url_name if match and match.url_name
+                    else 'unresolved')
+        directory = profiles_root() / url_name
+        directory.mkdir(parents=True, exist_ok=True)
+        filename = (f'{time.strftime("%Y%m%d-%H%M%S")}-'
+                    f'{request.method.lower()}-{int(elapsed * 1000)}ms-'
+                    f'{secrets.token_hex(3)}{EXTENSIONS[self.mode]}')
+        path = directory / filename
+        if self.mode == 'sampler':
+            profiler.dump(path)
+        else:
+            profiler.dump_stats(path)
+        rotate(directory)
@@ -0,0 +1,97 @@
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(limit=None, **methods):
+    """Объявляет предельное число запросов к базе для представления.
+
+    ``@query_budget(6)`` ограничивает все методы, ``@query_budget(GET=6)``
+    только перечисленные. То же можно задать атрибутом класса
+    ``max_queries = 6`` или ``max_queries = {'GET': 6}``.
+    """
+    budget = {method.upper(): value for method, value in methods.items()}
+    if limit is not None:
+        budget['*'] = limit
+
+    def decorator(view):
+        view.max_queries = budget
+        return view
+    return decorator
+
+
+def get_budget(view_func, method):
+    view = getattr(view_func, 'view_class', view_func)
+    budget = getattr(view, 'max_queries', None)
+    if isinstance(budget, dict):
+        return budget.get(method, budget.get('*'))
+    return budget
+
+
+def cache_tables():
+    return tuple(
+        options['LOCATION'] for options in settings.CACHES.values()
+        if options['BACKEND'] == 'django.core.cache.backends.db.DatabaseCache')
+
+
+class QueryCounter:
+    """Собирает SQL запросов к базе. Обращения к таблицам
+    ``DatabaseCache`` не считаются: с Redis или memcached их нет,
+    и бюджет не должен зависеть от выбранного бэкенда кеша.
+    Точки сохранения тоже пропускаются: они появляются, только когда
+    запрос выполняется внутри внешней транзакции, как в тестах.
+    """
+
+    SAVEPOINTS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+    def __init__(self):
+        self.queries = []
+        self.ignored = cache_tables()
+
+    def __call__(self, execute, sql, params, many, context):
+        if not (sql.startswith(self.SAVEPOINTS)
+                or any(table in sql for table in self.ignored)):
+            self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMiddleware:
+    """Проверяет, что представление уложилось в объявленный бюджет
+    запросов (``max_queries``). В отладке и тестах превышение —
+    исключение, в продакшене — предупреждение в журнале.
+    Считаются все запросы запроса, включая аутентификацию,
+    кроме обращений к кешу.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_BUDGET_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        budget = getattr(request, '_query_budget', None)
+        if budget is not None and len(counter.queries) > budget:
+            view = request.resolver_match._func_path
+            message = (f'{view}: {len(counter.queries)} запросов '
+                       f'к базе при бюджете {budget} ({request.method} '
+                       f'{request.path})')
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(
+                    message + '\n' + '\n'.join(counter.queries))
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = get_budget(view_func, request.method)
+
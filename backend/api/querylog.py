@@ -0,0 +1,152 @@
+import hashlib
+import re
+import sys
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import SlowQuery
+
+CALLER_MODULES = ('api.views', 'api.serializers')
+PROJECT_PACKAGES = ('api.', 'recipes.', 'users.')
+SKIP_MODULES = ('api.middleware', 'api.profiling', 'api.querylog')
+PLACEHOLDER_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+\b')
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    sql = STRING_LITERAL.sub('?', sql)
+    sql = PLACEHOLDER_LIST.sub('(...)', sql)
+    sql = NUMBER_LITERAL.sub('?', sql).replace('%s', '?')
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()
+
+
+def code_name(frame):
+    # co_qualname есть только в Python 3.11+, класс метода
+    # восстанавливается по self или cls.
+    code = frame.f_code
+    qualname = getattr(code, 'co_qualname', None)
+    if qualname:
+        return qualname
+    owner = frame.f_locals.get('self', frame.f_locals.get('cls'))
+    if owner is None:
+        return code.co_name
+    if not isinstance(owner, type):
+        owner = type(owner)
+    return f'{owner.__qualname__}.{code.co_name}'
+
+
+def find_caller(frame, request=None):
+    # Ленивые querysets выполняются в коде DRF и пагинации, поэтому
+    # без кадра из представлений или сериализаторов источником
+    # считается представление, разрешенное для запроса.
+    fallback = ''
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module.startswith(PROJECT_PACKAGES) and module not in SKIP_MODULES:
+            name = f'{module}.{code_name(frame)}'
+            if module in CALLER_MODULES:
+                return name
+            fallback = fallback or name
+        frame = frame.f_back
+    match = getattr(request, 'resolver_match', None)
+    view = match._func_path if match else ''
+    if view and fallback:
+        return f'{view} -> {fallback}'
+    return view or fallback
+
+
+class SlowQueryRecorder:
+    """Обертка ``connection.execute_wrapper``: замеряет запросы и
+    запоминает те, что дольше ``SLOW_QUERY_THRESHOLD`` мс.
+    Запись в базу откладывается до конца запроса (``flush``).
+    """
+
+    def __init__(self, request=None):
+        self.request = request
+        self.records = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            if elapsed >= settings.SLOW_QUERY_THRESHOLD:
+                self.records.append((
+                    sql, None if many else params, elapsed,
+                    find_caller(sys._getframe(1), self.request)[:255]))
+
+    def flush(self):
+        records, self.records = self.records, []
+        for sql, params, elapsed, caller in records:
+            record_slow_query(sql, params, elapsed, caller)
+
+
+def explain(sql, params):
+    if params is None or not sql.lstrip().upper().startswith('SELECT'):
+        return ''
+    options = {}
+    if (connection.vendor == 'postgresql'
+            and settings.SLOW_QUERY_EXPLAIN_ANALYZE):
+        options = {'analyze': True, 'buffers': True}
+    prefix = connection.ops.explain_query_prefix(**options)
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return '\n'.join(' '.join(str(value) for value in row)
+                             for row in cursor.fetchall())
+    except Exception as error:
+        return f'EXPLAIN не выполнен: {error}'
+
+
+def record_slow_query(sql, params, elapsed, caller):
+    key = fingerprint(sql)
+    now = timezone.now()
+    updated = SlowQuery.objects.filter(fingerprint=key).update(
+        count=F('count') + 1,
+        total_time=F('total_time') + elapsed,
+        max_time=Greatest('max_time', Value(elapsed)),
+        caller=caller,
+        last_seen=now,
+    )
+    if updated:
+        return
+    plan = explain(sql, params)
+    try:
+        with transaction.atomic():
+            SlowQuery.objects.create(
+                fingerprint=key, sql=sql, caller=caller, plan=plan,
+                count=1, total_time=elapsed, max_time=elapsed,
+                last_seen=now)
+    except IntegrityError:
+        record_slow_query(sql, params, elapsed, caller)
+
+
+class SlowQueryMiddleware:
+    """Журнал медленных запросов к базе, включается
+    ``SLOW_QUERY_LOG_ENABLED``; иначе не подключается вовсе.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_LOG_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = SlowQueryRecorder(request)
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        recorder.flush()
+        return response
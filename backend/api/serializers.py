@@ -4,9 +4,15 @@ from recipes.models import (Recipe, Ingredient, RecipeIngredient,
                             Favorite, ShoppingCart)
 from django.core.files.base import ContentFile
 import base64
-import uuid
+from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
+from djoser.conf import settings as djoser_settings
+from djoser.serializers import (
+    TokenCreateSerializer as BaseTokenCreateSerializer)
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q
+from .hashing import check_user_password, set_user_password
 
 
 class Base64ImageField(serializers.ImageField):
@@ -15,10 +21,82 @@ class Base64ImageField(serializers.ImageField):
             format, imgstr = data.split(';base64,')
             ext = format.split('/')[-1]
             data = ContentFile(base64.b64decode(imgstr),
-                               name=f'{uuid.uuid4()}.{ext}')
+                               name=f'image.{ext}')
         return super().to_internal_value(data)
 
 
+def requested_names(request, param):
+    if request is None or param not in request.query_params:
+        return None
+    return {name.strip()
+            for name in request.query_params[param].split(',')
+            if name.strip()}
+
+
+class RelatedIdsField(serializers.Field):
+    def __init__(self, attr='pk', **kwargs):
+        self.attr = attr
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return [getattr(item, self.attr) for item in value.all()]
+
+
+class SparseFieldsMixin:
+    """Поддержка ``?fields=`` и ``?expand=`` для корневого сериализатора.
+
+    Вложенные связи из ``expandable_fields`` по умолчанию раскрыты;
+    если передан ``expand``, нераскрытые связи выводятся как id.
+    """
+
+    expandable_fields = {}
+
+    @classmethod
+    def fieldset(cls, request):
+        available = set(cls.Meta.fields)
+        fields = requested_names(request, 'fields')
+        expand = requested_names(request, 'expand')
+        names = available if fields is None else fields & available
+        expanded = (set(cls.expandable_fields) if expand is None
+                    else expand & set(cls.expandable_fields))
+        return names, expanded
+
+    @classmethod
+    def only_fields(cls, queryset, request, related=()):
+        if requested_names(request, 'fields') is None:
+            return queryset
+        names, _ = cls.fieldset(request)
+        model_fields = {field.name
+                        for field in queryset.model._meta.concrete_fields}
+        return queryset.only(
+            'pk', *sorted((names & model_fields) | set(related)))
+
+    def is_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.is_root():
+            return fields
+        names, expanded = self.fieldset(self.context.get('request'))
+        for name in list(fields):
+            if name not in names:
+                del fields[name]
+            elif name in self.expandable_fields and name not in expanded:
+                fields[name] = self.expandable_fields[name]()
+        return fields
+
+
+def authenticated_user(request):
+    if request and request.user.is_authenticated:
+        return request.user
+    return None
+
+
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     id = serializers.IntegerField(read_only=True)
@@ -35,12 +113,12 @@ class UserCreateSerializer(serializers.ModelSerializer):
             first_name=validated_data['first_name'],
             last_name=validated_data['last_name']
         )
-        user.set_password(validated_data['password'])
+        set_user_password(user, validated_data['password'])
         user.save()
         return user
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -48,7 +126,20 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['email', 'id', 'username', 'first_name',
                   'last_name', 'is_subscribed', 'avatar']
 
+    @classmethod
+    def optimize_queryset(cls, queryset, request):
+        names, _ = cls.fieldset(request)
+        user = authenticated_user(request)
+        if user and 'is_subscribed' in names:
+            queryset = queryset.annotate(subscribed_flag=Exists(
+                Subscription.objects.filter(follower=user,
+                                            following=OuterRef('pk'))))
+        return cls.only_fields(queryset, request)
+
     def get_is_subscribed(self, obj):
+        annotated = getattr(obj, 'subscribed_flag', None)
+        if annotated is not None:
+            return annotated
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Subscription.objects.filter(
@@ -56,13 +147,30 @@ class UserSerializer(serializers.ModelSerializer):
         return False
 
 
+class TokenCreateSerializer(BaseTokenCreateSerializer):
+    """Вход по токену. Сериализатор djoser при неверном пароле проверяет
+    его второй раз через ``check_password`` в потоке запроса; здесь
+    пароль проверяется только в ``authenticate``, то есть в пуле.
+    """
+
+    def validate(self, attrs):
+        login_field = djoser_settings.LOGIN_FIELD
+        self.user = authenticate(
+            request=self.context.get('request'),
+            **{login_field: attrs.get(login_field)},
+            password=attrs.get('password'))
+        if self.user is None:
+            self.fail('invalid_credentials')
+        return attrs
+
+
 class SetPasswordSerializer(serializers.Serializer):
     current_password = serializers.CharField(required=True)
     new_password = serializers.CharField(required=True)
 
     def validate_current_password(self, value):
         user = self.context['request'].user
-        if not user.check_password(value):
+        if not check_user_password(user, value):
             raise serializers.ValidationError('Текущий пароль неверен')
         return value
 
@@ -88,7 +196,7 @@ class SetPasswordSerializer(serializers.Serializer):
 
     def save(self):
         user = self.context['request'].user
-        user.set_password(self.validated_data['new_password'])
+        set_user_password(user, self.validated_data['new_password'])
         user.save()
         return user
 
@@ -122,23 +230,73 @@ class RecipeMinifiedSerializer(serializers.ModelSerializer):
         return None
 
 
+class RecipeSimilarSerializer(RecipeMinifiedSerializer):
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeMinifiedSerializer.Meta):
+        fields = RecipeMinifiedSerializer.Meta.fields + ['similarity']
+
+
+class RecipePopularSerializer(RecipeMinifiedSerializer):
+    score = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeMinifiedSerializer.Meta):
+        fields = RecipeMinifiedSerializer.Meta.fields + ['score']
+
+
 class UserWithRecipesSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
 
+    expandable_fields = {
+        'recipes': lambda: serializers.SerializerMethodField(
+            method_name='get_recipe_ids'),
+    }
+
     class Meta(UserSerializer.Meta):
         fields = UserSerializer.Meta.fields + ['recipes', 'recipes_count']
 
-    def get_recipes(self, obj):
+    @classmethod
+    def optimize_queryset(cls, queryset, request):
+        queryset = super().optimize_queryset(queryset, request)
+        names, expanded = cls.fieldset(request)
+        if 'recipes_count' in names:
+            queryset = queryset.annotate(recipes_count_value=Count(
+                'recipes', filter=Q(recipes__deleted_at__isnull=True)))
+        if 'recipes' in names:
+            recipes = Recipe.objects.order_by('-pub_date')
+            if 'recipes' not in expanded:
+                recipes = recipes.only('id', 'author_id')
+            limit = request.query_params.get('recipes_limit')
+            if limit:
+                recipes = recipes[:int(limit)]
+            queryset = queryset.prefetch_related(Prefetch(
+                'recipes', queryset=recipes, to_attr='prefetched_recipes'))
+        return queryset
+
+    def get_recipe_ids(self, obj):
+        return [recipe.id for recipe in self.get_recipes_queryset(obj)]
+
+    def get_recipes_queryset(self, obj):
+        prefetched = getattr(obj, 'prefetched_recipes', None)
+        if prefetched is not None:
+            return prefetched
         request = self.context.get('request')
         limit = request.query_params.get('recipes_limit')
         queryset = obj.recipes.all()
         if limit:
             queryset = queryset[:int(limit)]
-        return RecipeMinifiedSerializer(queryset, many=True,
-                                        context={'request': request}).data
+        return queryset
+
+    def get_recipes(self, obj):
+        return RecipeMinifiedSerializer(
+            self.get_recipes_queryset(obj), many=True,
+            context={'request': self.context.get('request')}).data
 
     def get_recipes_count(self, obj):
+        annotated = getattr(obj, 'recipes_count_value', None)
+        if annotated is not None:
+            return annotated
         return obj.recipes.count()
 
 
@@ -162,7 +320,7 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'measurement_unit', 'amount']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     ingredients = RecipeIngredientSerializer(
         many=True, source='recipe_ingredients', read_only=True
@@ -171,12 +329,77 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField(read_only=True)
 
+    expandable_fields = {
+        'author': lambda: serializers.PrimaryKeyRelatedField(read_only=True),
+        'ingredients': lambda: RelatedIdsField(
+            source='recipe_ingredients', attr='ingredient_id'),
+    }
+
     class Meta:
         model = Recipe
         fields = ['id', 'author', 'name', 'image', 'text', 'ingredients',
                   'cooking_time', 'is_favorited', 'is_in_shopping_cart']
 
+    @classmethod
+    def optimize_queryset(cls, queryset, request):
+        names, expanded = cls.fieldset(request)
+        user = authenticated_user(request)
+        if 'author' in names and 'author' in expanded:
+            queryset = queryset.select_related('author')
+            if user:
+                queryset = queryset.annotate(author_subscribed_flag=Exists(
+                    Subscription.objects.filter(
+                        follower=user, following=OuterRef('author_id'))))
+        if 'ingredients' in names:
+            queryset = queryset.prefetch_related(
+                'recipe_ingredients__ingredient'
+                if 'ingredients' in expanded else 'recipe_ingredients')
+        if user and 'is_favorited' in names:
+            queryset = queryset.annotate(favorited_flag=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))))
+        if user and 'is_in_shopping_cart' in names:
+            queryset = queryset.annotate(in_cart_flag=Exists(
+                ShoppingCart.objects.filter(user=user,
+                                            recipe=OuterRef('pk'))))
+        return cls.only_fields(
+            queryset, request,
+            related=['author'] if 'author' in names else [])
+
+    @classmethod
+    def attach_user_flags(cls, recipes, request):
+        """Одним запросом проставляет флаги пользователя рецептам,
+        полученным не через ``optimize_queryset`` (например, из кеша).
+        """
+        user = authenticated_user(request)
+        if user is None or not recipes:
+            return recipes
+        flags = Recipe.objects.filter(
+            pk__in=[recipe.pk for recipe in recipes]
+        ).annotate(
+            favorited_flag=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            in_cart_flag=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            author_subscribed_flag=Exists(Subscription.objects.filter(
+                follower=user, following=OuterRef('author_id'))),
+        ).values('pk', 'favorited_flag', 'in_cart_flag',
+                 'author_subscribed_flag')
+        by_pk = {row.pop('pk'): row for row in flags}
+        for recipe in recipes:
+            for name, value in by_pk.get(recipe.pk, {}).items():
+                setattr(recipe, name, value)
+        return recipes
+
+    def to_representation(self, instance):
+        subscribed = getattr(instance, 'author_subscribed_flag', None)
+        if subscribed is not None:
+            instance.author.subscribed_flag = subscribed
+        return super().to_representation(instance)
+
     def get_is_favorited(self, obj):
+        annotated = getattr(obj, 'favorited_flag', None)
+        if annotated is not None:
+            return annotated
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Favorite.objects.filter(user=request.user,
@@ -184,6 +407,9 @@ class RecipeSerializer(serializers.ModelSerializer):
         return False
 
     def get_is_in_shopping_cart(self, obj):
+        annotated = getattr(obj, 'in_cart_flag', None)
+        if annotated is not None:
+            return annotated
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return ShoppingCart.objects.filter(user=request.user,
@@ -191,6 +417,13 @@ class RecipeSerializer(serializers.ModelSerializer):
         return False
 
 
+class RecipeCoverageSerializer(RecipeSerializer):
+    coverage = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ['coverage']
+
+
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientSerializer(
         many=True, source='recipe_ingredients', required=True)
@@ -215,6 +448,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             )
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('recipe_ingredients')
         recipe = Recipe.objects.create(
@@ -235,6 +469,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
                 )
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('recipe_ingredients', None)
         if ingredients_data is not None:
@@ -0,0 +1,126 @@
+import threading
+
+from django.db import transaction
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from recipes.models import Recipe, RecipeIngredient
+from users.models import CustomUser
+from .ingredient_index import ingredient_index
+from .similarity import similarity_index
+from .changes import EXPORTED_FIELDS, record_instance_change
+from .models import Change
+from .objectcache import recipe_cache, user_cache
+from .versions import bump_table_version
+from .tasks import cleanup_media_file
+
+MEDIA_FIELDS = {Recipe: 'image', CustomUser: 'avatar'}
+VERSIONED_APPS = ('recipes', 'users')
+
+_local = threading.local()
+
+
+def schedule_recipe_refresh(recipe_id):
+    # Внутри транзакции рецепт обновляется один раз — после коммита.
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        pending = _local.pending = set()
+    if recipe_id in pending:
+        return
+    pending.add(recipe_id)
+
+    def refresh():
+        pending.discard(recipe_id)
+        ingredient_index.refresh(recipe_id)
+        similarity_index.refresh(recipe_id)
+
+    transaction.on_commit(refresh)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def update_recipe_indexes(sender, instance, **kwargs):
+    schedule_recipe_refresh(instance.id)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def update_recipe_ingredient_indexes(sender, instance, **kwargs):
+    schedule_recipe_refresh(instance.recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_cached_recipe(sender, instance, **kwargs):
+    recipe_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def invalidate_cached_recipe_ingredients(sender, instance, **kwargs):
+    recipe_cache.invalidate(instance.recipe_id)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+def record_saved_change(sender, instance, **kwargs):
+    record_instance_change(instance, Change.SAVE)
+
+
+def record_deleted_change(sender, instance, **kwargs):
+    record_instance_change(instance, Change.DELETE)
+
+
+for tracked_model in EXPORTED_FIELDS:
+    post_save.connect(record_saved_change, sender=tracked_model)
+    post_delete.connect(record_deleted_change, sender=tracked_model)
+
+
+def stored_file_name(instance, field):
+    value = instance.__dict__.get(field)
+    if isinstance(value, str):
+        return value
+    if isinstance(value, FieldFile) and value._committed:
+        return value.name or ''
+    return ''
+
+
+@receiver(post_init, sender=Recipe)
+@receiver(post_init, sender=CustomUser)
+def remember_media_file(sender, instance, **kwargs):
+    instance._stored_media = stored_file_name(instance, MEDIA_FIELDS[sender])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=CustomUser)
+def cleanup_replaced_media(sender, instance, **kwargs):
+    field = MEDIA_FIELDS[sender]
+    if field in instance.get_deferred_fields():
+        return
+    previous = getattr(instance, '_stored_media', '')
+    current = stored_file_name(instance, field)
+    instance._stored_media = current
+    if previous and previous != current:
+        cleanup_media_file.enqueue(
+            previous, idempotency_key=f'cleanup-media:{previous}')
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=CustomUser)
+def cleanup_deleted_media(sender, instance, **kwargs):
+    name = stored_file_name(instance, MEDIA_FIELDS[sender])
+    if name:
+        cleanup_media_file.enqueue(
+            name, idempotency_key=f'cleanup-media:{name}')
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def update_table_version(sender, **kwargs):
+    if sender._meta.app_label in VERSIONED_APPS:
+        bump_table_version(sender._meta.db_table)
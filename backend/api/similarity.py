@@ -0,0 +1,207 @@
+import threading
+import time
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from recipes.models import Recipe, RecipeIngredient, RecipeSignature
+from .versions import bump_table_version, get_table_versions
+
+# Сигнатуры пишутся после коммита изменений ингредиентов, поэтому
+# вместе с рецептами отслеживается таблица сигнатур.
+INDEX_TABLES = (Recipe._meta.db_table, RecipeSignature._meta.db_table)
+
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+class SimilarityIndex:
+    """MinHash-сигнатуры наборов ингредиентов и LSH-корзины по полосам.
+
+    Кандидаты берутся из совпадающих корзин, затем ранжируются
+    по точному коэффициенту Жаккара. Сигнатуры перечитываются, когда
+    меняются общие версии ``INDEX_TABLES``, и не реже чем раз
+    в ``max_age`` секунд.
+    """
+
+    def __init__(self, num_perm, bands, max_candidates, max_age, seed=1):
+        if num_perm % bands:
+            raise ValueError('num_perm должно делиться на bands')
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_candidates = max_candidates
+        self.max_age = max_age
+        generator = np.random.default_rng(seed)
+        self._a = generator.integers(
+            1, MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self._b = generator.integers(
+            0, MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self._lock = threading.RLock()
+        self._signatures = {}
+        self._buckets = [{} for _ in range(bands)]
+        self._loaded_at = None
+        self._versions = None
+
+    def compute(self, ingredient_ids):
+        values = np.fromiter(ingredient_ids, dtype=np.uint64)
+        hashes = (self._a * values + self._b) % MERSENNE_PRIME
+        return hashes.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes()
+                for band in range(self.bands)]
+
+    def _add(self, recipe_id, signature):
+        self._signatures[recipe_id] = signature
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(key, set()).add(recipe_id)
+
+    def _remove(self, recipe_id):
+        signature = self._signatures.pop(recipe_id, None)
+        if signature is None:
+            return
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            bucket = buckets.get(key)
+            if bucket is not None:
+                bucket.discard(recipe_id)
+                if not bucket:
+                    del buckets[key]
+
+    def load(self):
+        expected_size = self.num_perm * np.dtype(np.uint32).itemsize
+        versions = get_table_versions(INDEX_TABLES)
+        signatures = {}
+        for recipe_id, raw in RecipeSignature.objects.filter(
+                recipe__deleted_at__isnull=True).values_list(
+                'recipe_id', 'signature').iterator(chunk_size=2000):
+            if len(raw) == expected_size:
+                signatures[recipe_id] = np.frombuffer(raw, dtype=np.uint32)
+        with self._lock:
+            self._signatures = {}
+            self._buckets = [{} for _ in range(self.bands)]
+            for recipe_id, signature in signatures.items():
+                self._add(recipe_id, signature)
+            self._versions = versions
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if (self._loaded_at is None
+                or time.monotonic() - self._loaded_at > self.max_age
+                or get_table_versions(INDEX_TABLES) != self._versions):
+            self.load()
+
+    def rebuild(self, batch_size=1000):
+        rows = (RecipeIngredient.objects
+                .order_by('recipe_id')
+                .values_list('recipe_id', 'ingredient_id')
+                .iterator(chunk_size=batch_size * 10))
+        total = 0
+        with transaction.atomic():
+            RecipeSignature.objects.all().delete()
+            batch = []
+            for recipe_id, group in groupby(rows, key=itemgetter(0)):
+                signature = self.compute(row[1] for row in group)
+                batch.append(RecipeSignature(
+                    recipe_id=recipe_id, signature=signature.tobytes()))
+                if len(batch) >= batch_size:
+                    RecipeSignature.objects.bulk_create(batch)
+                    total += len(batch)
+                    batch = []
+            RecipeSignature.objects.bulk_create(batch)
+            total += len(batch)
+            bump_table_version(RecipeSignature._meta.db_table)
+        self.load()
+        return total
+
+    def add_recipes(self, recipes, batch_size=1000):
+        """Сигнатуры для новых рецептов одним ``bulk_create``;
+        ``recipes`` — пары (id рецепта, id ингредиентов).
+        """
+        signatures = {recipe_id: self.compute(ingredient_ids)
+                      for recipe_id, ingredient_ids in recipes}
+        RecipeSignature.objects.bulk_create(
+            [RecipeSignature(recipe_id=recipe_id,
+                             signature=signature.tobytes())
+             for recipe_id, signature in signatures.items()],
+            batch_size=batch_size)
+        bump_table_version(RecipeSignature._meta.db_table)
+
+        def add():
+            with self._lock:
+                for recipe_id, signature in signatures.items():
+                    self._remove(recipe_id)
+                    self._add(recipe_id, signature)
+
+        transaction.on_commit(add)
+
+    def refresh(self, recipe_id):
+        ingredient_ids = list(
+            RecipeIngredient.objects.filter(
+                recipe_id=recipe_id, recipe__deleted_at__isnull=True)
+            .values_list('ingredient_id', flat=True)
+        )
+        if not ingredient_ids:
+            RecipeSignature.objects.filter(recipe_id=recipe_id).delete()
+            with self._lock:
+                self._remove(recipe_id)
+            return
+        signature = self.compute(ingredient_ids)
+        RecipeSignature.objects.update_or_create(
+            recipe_id=recipe_id,
+            defaults={'signature': signature.tobytes()}
+        )
+        with self._lock:
+            self._remove(recipe_id)
+            self._add(recipe_id, signature)
+
+    def discard(self, recipe_ids):
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._remove(recipe_id)
+
+    def similar(self, recipe_id, limit):
+        self._ensure_loaded()
+        with self._lock:
+            signature = self._signatures.get(recipe_id)
+            if signature is None:
+                return []
+            candidates = set()
+            for buckets, key in zip(self._buckets,
+                                    self._band_keys(signature)):
+                candidates |= buckets.get(key, set())
+            candidates.discard(recipe_id)
+            candidates = list(candidates)
+            if not candidates:
+                return []
+            matrix = np.stack([self._signatures[candidate]
+                               for candidate in candidates])
+        estimates = (matrix == signature).mean(axis=1)
+        order = np.argsort(-estimates, kind='stable')[:self.max_candidates]
+        candidates = [candidates[position] for position in order]
+
+        ingredient_sets = {}
+        for owner_id, ingredient_id in RecipeIngredient.objects.filter(
+                recipe_id__in=candidates + [recipe_id]).values_list(
+                'recipe_id', 'ingredient_id'):
+            ingredient_sets.setdefault(owner_id, set()).add(ingredient_id)
+        target = ingredient_sets.get(recipe_id, set())
+        ranking = []
+        for candidate in candidates:
+            other = ingredient_sets.get(candidate)
+            if not target or not other:
+                continue
+            jaccard = len(target & other) / len(target | other)
+            ranking.append((candidate, round(jaccard, 4)))
+        ranking.sort(key=lambda item: (-item[1], item[0]))
+        return ranking[:limit]
+
+
+similarity_index = SimilarityIndex(
+    num_perm=settings.SIMILAR_RECIPES_NUM_PERM,
+    bands=settings.SIMILAR_RECIPES_BANDS,
+    max_candidates=settings.SIMILAR_RECIPES_MAX_CANDIDATES,
+    max_age=settings.SIMILAR_RECIPES_MAX_AGE,
+)
@@ -0,0 +1,120 @@
+import math
+import random
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+Entry = namedtuple('Entry', 'value version expires delta')
+
+
+class SingleFlight:
+    """Кеш, в котором дорогое значение пересчитывает один вызывающий.
+
+    Внутри процесса вызовы с одним ключом встают на общую блокировку,
+    между процессами пересчет закрепляется арендой в общем кеше
+    (``cache.add``). Остальные получают устаревшее значение, если оно
+    есть, или коротко ждут результата. Значение с другой ``version``
+    считается устаревшим, но тоже годится на время пересчета.
+    Горячие ключи обновляются заранее с вероятностью, растущей
+    к концу срока (XFetch), поэтому не истекают одновременно.
+    """
+
+    def __init__(self, prefix, timeout):
+        self.prefix = prefix
+        self.timeout = timeout
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def key(self, key):
+        return f'singleflight:{self.prefix}:{key}'
+
+    def lease_key(self, key):
+        return f'singleflight-lease:{self.prefix}:{key}'
+
+    def is_fresh(self, entry, version):
+        if entry is None or entry.version != version:
+            return False
+        # XFetch: чем дороже пересчет и ближе срок, тем раньше
+        # кто-то один возьмется обновить значение.
+        early = (entry.delta * settings.SINGLE_FLIGHT_BETA
+                 * -math.log(1 - random.random()))
+        return time.time() + early < entry.expires
+
+    def _acquire_local(self, key, blocking):
+        with self._guard:
+            lock, waiters = self._locks.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._locks[key] = (lock, waiters + 1)
+        acquired = lock.acquire(
+            timeout=settings.SINGLE_FLIGHT_WAIT if blocking else 0)
+        if not acquired:
+            self._release_local(key, locked=False)
+        return acquired
+
+    def _release_local(self, key, locked=True):
+        with self._guard:
+            lock, waiters = self._locks[key]
+            if waiters > 1:
+                self._locks[key] = (lock, waiters - 1)
+            else:
+                del self._locks[key]
+        if locked:
+            lock.release()
+
+    def _compute(self, key, compute, version):
+        started = time.time()
+        value = compute()
+        delta = time.time() - started
+        cache.set(self.key(key),
+                  Entry(value, version, time.time() + self.timeout, delta),
+                  self.timeout + settings.SINGLE_FLIGHT_STALE_GRACE)
+        return value, version
+
+    def _wait(self, key, version):
+        deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(settings.SINGLE_FLIGHT_POLL)
+            entry = cache.get(self.key(key))
+            if entry is not None and entry.version == version:
+                return entry
+        return None
+
+    def get(self, key, compute, version=None):
+        return self.get_versioned(key, compute, version)[0]
+
+    def get_versioned(self, key, compute, version=None):
+        """Как ``get``, но возвращает пару (значение, его версия):
+        при отдаче устаревшего значения версия отличается от запрошенной.
+        """
+        stale = cache.get(self.key(key))
+        if self.is_fresh(stale, version):
+            return stale.value, stale.version
+        if not self._acquire_local(key, blocking=stale is None):
+            if stale is not None:
+                return stale.value, stale.version
+            # Соседний поток не успел за время ожидания: считаем сами.
+            return self._compute(key, compute, version)
+        try:
+            # Пока ждали блокировку, значение мог обновить сосед.
+            entry = cache.get(self.key(key))
+            if (entry is not None and entry.version == version
+                    and (stale is None or stale[1:] != entry[1:])):
+                return entry.value, entry.version
+            lease = self.lease_key(key)
+            if cache.add(lease, 1, settings.SINGLE_FLIGHT_LEASE_TIMEOUT):
+                try:
+                    return self._compute(key, compute, version)
+                finally:
+                    cache.delete(lease)
+            if stale is not None:
+                return stale.value, stale.version
+            entry = self._wait(key, version)
+            if entry is not None:
+                return entry.value, entry.version
+            return self._compute(key, compute, version)
+        finally:
+            self._release_local(key)
@@ -0,0 +1,76 @@
+import hashlib
+import os
+import posixpath
+import time
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+
+MEDIA_REFERENCES = (
+    ('recipes.Recipe', 'image'),
+    ('users.CustomUser', 'avatar'),
+)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Сохраняет файлы под хешем содержимого: одинаковые загрузки
+    указывают на один и тот же файл, а имена файлов никогда не меняются.
+
+    Время изменения файла — время последней загрузки с таким
+    содержимым: по нему удаление файла без ссылок не трогает файл,
+    ссылку на который еще могут записывать.
+    """
+
+    def save(self, name, content, max_length=None):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        extension = posixpath.splitext(filename)[1].lower()
+        name = posixpath.join(directory, digest.hexdigest() + extension)
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return super().save(name, content, max_length=max_length)
+        return name
+
+    def delete_unless_recent(self, name, grace):
+        """Удаляет файл, если его не загружали последние ``grace``
+        секунд; возвращает, сколько секунд осталось ждать, или 0.
+
+        Файл сначала переименовывается: повторная загрузка после этого
+        запишет его заново, а загрузка до этого обновила время
+        изменения, и файл возвращается на место.
+        """
+        path = self.path(name)
+        removed = f'{path}.{uuid.uuid4().hex}.removed'
+        try:
+            os.rename(path, removed)
+        except FileNotFoundError:
+            return 0
+        remaining = os.stat(removed).st_mtime + grace - time.time()
+        if remaining > 0:
+            os.replace(removed, path)
+            return remaining
+        os.remove(removed)
+        return 0
+
+
+def count_references(name):
+    return sum(
+        apps.get_model(model).objects.filter(**{field: name}).count()
+        for model, field in MEDIA_REFERENCES
+    )
+
+
+def delete_if_orphaned(name):
+    """Удаляет файл без ссылок; возвращает, через сколько секунд
+    проверку нужно повторить, или 0.
+    """
+    if not name or count_references(name):
+        return 0
+    return default_storage.delete_unless_recent(
+        name, settings.MEDIA_ORPHAN_GRACE)
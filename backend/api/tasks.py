@@ -0,0 +1,111 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+
+from recipes.models import (Favorite, Recipe, RecipeEngagement,
+                            RecipeIngredient, RecipeSignature, ShoppingCart)
+from users.models import CustomUser, Subscription
+from .changes import is_tracked, record_deletions
+from .ingredient_index import ingredient_index
+from .jobs import report_progress, task
+from .objectcache import recipe_cache
+from .similarity import similarity_index
+from .storage import delete_if_orphaned
+from .versions import bump_table_version
+
+RECIPE_DEPENDENTS = (RecipeIngredient, Favorite, ShoppingCart,
+                     RecipeSignature, RecipeEngagement)
+USER_DEPENDENTS = (
+    (Favorite, 'user_id'),
+    (ShoppingCart, 'user_id'),
+    (Subscription, 'follower_id'),
+    (Subscription, 'following_id'),
+)
+
+
+@task
+def cleanup_media_file(name):
+    remaining = delete_if_orphaned(name)
+    if remaining:
+        # Файл недавно загрузили снова: ключ идемпотентности занят
+        # текущей задачей, поэтому повтор ставится без него.
+        cleanup_media_file.enqueue(name, delay=timedelta(seconds=remaining))
+
+
+def raw_delete(queryset):
+    deleted = queryset._raw_delete(queryset.db)
+    if deleted:
+        bump_table_version(queryset.model._meta.db_table)
+    return deleted
+
+
+def purge_recipe_batch(recipe_ids):
+    """Удаляет рецепты и их зависимые строки прямыми ``DELETE``
+    от листьев к корню, без загрузки объектов в память.
+    """
+    with transaction.atomic():
+        images = list(
+            Recipe.all_objects.filter(id__in=recipe_ids)
+            .exclude(image='').values_list('image', flat=True)
+        )
+        for model in RECIPE_DEPENDENTS:
+            dependents = model.objects.filter(recipe_id__in=recipe_ids)
+            if is_tracked(model):
+                record_deletions(dependents)
+            raw_delete(dependents)
+        deleted = raw_delete(Recipe.all_objects.filter(id__in=recipe_ids))
+        recipe_cache.invalidate(*recipe_ids)
+        for name in images:
+            cleanup_media_file.enqueue(
+                name, idempotency_key=f'cleanup-media:{name}')
+
+    def refresh_indexes():
+        for recipe_id in recipe_ids:
+            ingredient_index.refresh(recipe_id)
+            similarity_index.refresh(recipe_id)
+
+    transaction.on_commit(refresh_indexes)
+    return deleted
+
+
+def purge_in_batches(queryset, label, progress):
+    batch_size = settings.PURGE_BATCH_SIZE
+    progress.setdefault(label, 0)
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return
+        batch = queryset.model.objects.filter(id__in=ids)
+        with transaction.atomic():
+            record_deletions(batch)
+            progress[label] += raw_delete(batch)
+        report_progress(**progress)
+
+
+@task
+def purge_recipe(recipe_id):
+    purge_recipe_batch([recipe_id])
+
+
+@task
+def purge_user(user_id):
+    progress = {'recipes': 0}
+    recipes = Recipe.all_objects.filter(author_id=user_id).order_by('id')
+    batch_size = settings.PURGE_BATCH_SIZE
+    while True:
+        ids = list(recipes.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        progress['recipes'] += purge_recipe_batch(ids)
+        report_progress(**progress)
+    for model, field in USER_DEPENDENTS:
+        purge_in_batches(model.objects.filter(**{field: user_id}),
+                         model._meta.model_name, progress)
+    # Оставшиеся зависимые строки (токены, группы, журнал админки)
+    # немногочисленны, их удаляет обычный каскад Django.
+    user = CustomUser.objects.filter(id=user_id).first()
+    if user is not None:
+        user.delete()
+    progress['done'] = True
+    report_progress(**progress)
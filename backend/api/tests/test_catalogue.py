@@ -0,0 +1,40 @@
+import orjson
+from django.core.cache import cache
+from django.test import TestCase
+
+from recipes.models import Ingredient
+from ..catalogue import (IngredientCatalogue, catalogue_bodies,
+                         ingredient_catalogue)
+from .utils import cold_caches
+
+
+class IngredientCatalogueTests(TestCase):
+
+    def setUp(self):
+        cold_caches()
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+
+    def test_stale_body_is_not_kept_under_new_stamp(self):
+        first, second = IngredientCatalogue(), IngredientCatalogue()
+        first.get()
+        second.get()
+        Ingredient.objects.create(name='перец', measurement_unit='г')
+        # Новую версию документа в это время собирает другой процесс.
+        cache.add(catalogue_bodies.lease_key('ingredients'), 1)
+        snapshot = second.get()
+        self.assertTrue(snapshot.stale)
+        self.assertEqual(len(orjson.loads(snapshot.body)), 1)
+        cache.delete(catalogue_bodies.lease_key('ingredients'))
+        snapshot = second.get()
+        self.assertFalse(snapshot.stale)
+        self.assertEqual(len(orjson.loads(snapshot.body)), 2)
+
+    def test_stale_body_is_not_cached_by_clients(self):
+        self.client.get('/api/ingredients/')
+        Ingredient.objects.create(name='перец', measurement_unit='г')
+        cache.add(catalogue_bodies.lease_key('ingredients'), 1)
+        # Снимок процесса истек, новую версию собирает другой процесс.
+        ingredient_catalogue._snapshot = (
+            ingredient_catalogue._snapshot._replace(built_at=0))
+        response = self.client.get('/api/ingredients/')
+        self.assertIn('no-cache', response['Cache-Control'])
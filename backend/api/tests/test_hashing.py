@@ -0,0 +1,38 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from users.models import CustomUser
+from .. import hashing
+
+
+class LoginTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='user@example.com', username='user', first_name='Имя',
+            last_name='Фамилия', password='S3cret-pass')
+
+    def login(self, password):
+        return self.client.post('/api/auth/token/login/',
+                                {'email': 'user@example.com',
+                                 'password': password})
+
+    def test_login(self):
+        response = self.login('S3cret-pass')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('auth_token', response.json())
+
+    def test_wrong_password_is_checked_once_in_pool(self):
+        with mock.patch.object(
+                hashing.hashing_pool, 'run',
+                wraps=hashing.hashing_pool.run) as run, mock.patch.object(
+                CustomUser, 'check_password',
+                side_effect=AssertionError('проверка вне пула')):
+            response = self.login('wrong-pass')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(run.call_count, 1)
+
+    def test_inactive_user_cannot_login(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.login('S3cret-pass').status_code, 400)
@@ -0,0 +1,57 @@
+import base64
+import io
+import tempfile
+
+import orjson
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe
+from users.models import CustomUser
+
+
+def image_uri():
+    buffer = io.BytesIO()
+    Image.new('RGB', (2, 2)).save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+class RecipeImportViewTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        admin = CustomUser.objects.create_superuser(
+            email='admin@example.com', username='admin',
+            first_name='Имя', last_name='Фамилия', password='S3cret-pass')
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        self.ingredient = Ingredient.objects.create(
+            name='соль', measurement_unit='г')
+
+    def test_input_parameter_selects_reader(self):
+        row = {'name': 'Суп', 'text': 'Описание', 'cooking_time': 5,
+               'image': image_uri(),
+               'ingredients': [{'id': self.ingredient.id, 'amount': 2}]}
+        csv = ('name,text,cooking_time,image,ingredients\n'
+               f'Каша,Описание,5,"{image_uri()}",соль:г:2\n')
+        for value, body in (('ndjson', orjson.dumps(row)),
+                            ('csv', csv.encode())):
+            with self.subTest(input=value):
+                response = self.client.post(
+                    f'/api/recipes/import/?input={value}', body,
+                    content_type='application/octet-stream')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['created'], 1,
+                                 response.json())
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_unknown_input(self):
+        response = self.client.post('/api/recipes/import/?input=xml', b'',
+                                    content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.test import TestCase
+
+from recipes.models import Recipe, RecipeIngredient
+from ..ingredient_index import ingredient_index
+from ..similarity import SimilarityIndex, similarity_index
+from .test_query_counts import create_ingredients, create_user
+from .utils import cold_caches
+
+
+class SharedVersionTests(TestCase):
+    """Индексы процесса видят рецепты, добавленные другим процессом:
+    обработчики после коммита в тестах не выполняются, и об изменении
+    сообщают только общие версии таблиц.
+    """
+
+    def setUp(self):
+        cold_caches()
+        self.ingredients = create_ingredients(3)
+        self.author = create_user()
+        self.first = self.create_recipe()
+
+    def create_recipe(self):
+        recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/images/recipe.png')
+        for ingredient in self.ingredients:
+            RecipeIngredient.objects.create(recipe=recipe,
+                                            ingredient=ingredient, amount=1)
+        return recipe
+
+    def test_ingredient_index(self):
+        ids = [ingredient.id for ingredient in self.ingredients]
+        self.assertEqual(
+            [recipe_id for recipe_id, _ in ingredient_index.search(ids, 1)],
+            [self.first.id])
+        second = self.create_recipe()
+        self.assertEqual(
+            [recipe_id for recipe_id, _ in ingredient_index.search(ids, 1)],
+            [self.first.id, second.id])
+
+    def test_similarity_index(self):
+        other_process = SimilarityIndex(
+            num_perm=settings.SIMILAR_RECIPES_NUM_PERM,
+            bands=settings.SIMILAR_RECIPES_BANDS,
+            max_candidates=settings.SIMILAR_RECIPES_MAX_CANDIDATES,
+            max_age=settings.SIMILAR_RECIPES_MAX_AGE)
+        other_process.refresh(self.first.id)
+        self.assertEqual(similarity_index.similar(self.first.id, 10), [])
+        second = self.create_recipe()
+        other_process.refresh(second.id)
+        self.assertEqual(similarity_index.similar(self.first.id, 10),
+                         [(second.id, 1.0)])
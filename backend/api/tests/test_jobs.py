@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..jobs import claim_jobs, enqueue, execute, task
+from ..models import Job
+
+calls = []
+
+
+@task(name='api.tests.record', max_attempts=2)
+def record(value):
+    calls.append(value)
+
+
+@task(name='api.tests.fail', max_attempts=2)
+def fail():
+    raise RuntimeError('сбой')
+
+
+class JobTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_claim(self):
+        job = record.enqueue(1)
+        record.enqueue(2, delay=timedelta(hours=1))
+        claimed = claim_jobs(10)
+        self.assertEqual([item.id for item in claimed], [job.id])
+        self.assertEqual(claimed[0].status, Job.RUNNING)
+        self.assertTrue(claimed[0].locked_by)
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_stale_lock_is_reclaimed(self):
+        job = record.enqueue(1)
+        first, = claim_jobs(10)
+        Job.objects.filter(id=job.id).update(
+            locked_at=timezone.now() - timedelta(days=1))
+        second, = claim_jobs(10)
+        self.assertEqual(second.id, job.id)
+        self.assertNotEqual(second.locked_by, first.locked_by)
+        # Прежний обработчик больше не владеет задачей.
+        self.assertTrue(execute(first))
+        self.assertEqual(Job.objects.get(id=job.id).status, Job.RUNNING)
+
+    def test_success(self):
+        record.enqueue(1)
+        job, = claim_jobs(10)
+        self.assertTrue(execute(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(calls, [1])
+
+    def test_retry_then_fail(self):
+        fail.enqueue()
+        job, = claim_jobs(10)
+        self.assertFalse(execute(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('RuntimeError', job.last_error)
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        job, = claim_jobs(10)
+        self.assertFalse(execute(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_idempotency_key(self):
+        first = record.enqueue(1, idempotency_key='record')
+        self.assertEqual(record.enqueue(1, idempotency_key='record').id,
+                         first.id)
+        job, = claim_jobs(10)
+        self.assertEqual(enqueue(record, 1, idempotency_key='record').id,
+                         first.id)
+        execute(job)
+        self.assertNotEqual(
+            record.enqueue(1, idempotency_key='record').id, first.id)
@@ -0,0 +1,39 @@
+import tempfile
+from pathlib import Path
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from users.models import CustomUser
+
+
+class ProfileDownloadTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.base = Path(directory.name)
+        (self.base / 'profiles' / 'recipe-list').mkdir(parents=True)
+        (self.base / 'profiles' / 'recipe-list' / 'run.prof').write_bytes(
+            b'profile')
+        (self.base / 'secret.txt').write_bytes(b'secret')
+        admin = CustomUser.objects.create_superuser(
+            email='admin@example.com', username='admin',
+            first_name='Имя', last_name='Фамилия', password='S3cret-pass')
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        settings = override_settings(PROFILING_DIR=self.base / 'profiles')
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_download(self):
+        response = self.client.get('/api/profiles/recipe-list/run.prof/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'profile')
+
+    def test_parent_directory_is_rejected(self):
+        for path in ('/api/profiles/../secret.txt/',
+                     '/api/profiles/./../secret.txt/',
+                     '/api/profiles/recipe-list/..%2F..%2Fsecret.txt/'):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path).status_code, 404)
@@ -0,0 +1,120 @@
+from itertools import count
+
+from django.test import TestCase
+from django.urls import resolve
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Ingredient, Recipe, RecipeIngredient
+from users.models import CustomUser, Subscription
+from ..popularity import record_engagement
+from ..querybudget import get_budget
+from ..similarity import similarity_index
+from .utils import assert_constant_queries, cold_caches, count_queries
+
+ROWS = 10
+serial = count(1)
+
+
+def create_user():
+    number = next(serial)
+    return CustomUser.objects.create_user(
+        email=f'user{number}@example.com', username=f'user{number}',
+        first_name='Имя', last_name='Фамилия', password='S3cret-pass')
+
+
+def create_ingredients(rows):
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {next(serial)}', measurement_unit='г')
+        for _ in range(rows))
+
+
+def create_recipe(author, ingredients):
+    recipe = Recipe.objects.create(
+        author=author, name=f'Рецепт {next(serial)}', text='Описание',
+        cooking_time=10, image='recipes/images/recipe.png')
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+        for ingredient in ingredients)
+    similarity_index.refresh(recipe.id)
+    return recipe
+
+
+class QueryCountTests(TestCase):
+    """Число запросов к спискам не зависит от числа строк,
+    а холодный запрос укладывается в объявленный бюджет.
+    """
+
+    def setUp(self):
+        cold_caches()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user)}')
+        self.ingredients = create_ingredients(3)
+        self.recipe = create_recipe(create_user(), self.ingredients)
+
+    def create_recipes(self, rows):
+        for _ in range(rows):
+            recipe = create_recipe(create_user(), self.ingredients)
+            Favorite.objects.create(user=self.user, recipe=recipe)
+            record_engagement(recipe.id, 'favorites')
+
+    def create_subscriptions(self, rows):
+        for _ in range(rows):
+            author = create_user()
+            create_recipe(author, self.ingredients)
+            Subscription.objects.create(follower=self.user, following=author)
+
+    def create_users(self, rows):
+        for _ in range(rows):
+            create_user()
+
+    def assert_within_budget(self, path):
+        cold_caches()
+        response, queries = count_queries(self.client, path)
+        self.assertEqual(response.status_code, 200, path)
+        budget = get_budget(resolve(path).func, 'GET')
+        self.assertIsNotNone(budget, path)
+        self.assertLessEqual(len(queries), budget,
+                             f'{path}:\n' + '\n'.join(queries))
+
+    def test_recipe_list(self):
+        assert_constant_queries(self.client, '/api/recipes/',
+                                self.create_recipes, ROWS)
+
+    def test_similar_recipes(self):
+        assert_constant_queries(
+            self.client, f'/api/recipes/{self.recipe.id}/similar/',
+            self.create_recipes, ROWS)
+
+    def test_popular_recipes(self):
+        assert_constant_queries(self.client, '/api/recipes/popular/',
+                                self.create_recipes, ROWS)
+
+    def test_user_list(self):
+        assert_constant_queries(self.client, '/api/users/',
+                                self.create_users, ROWS)
+
+    def test_subscriptions(self):
+        assert_constant_queries(self.client, '/api/users/subscriptions/',
+                                self.create_subscriptions, ROWS)
+
+    def test_ingredient_list(self):
+        assert_constant_queries(self.client, '/api/ingredients/',
+                                create_ingredients, ROWS)
+
+    def test_cold_requests_within_budget(self):
+        self.create_recipes(ROWS)
+        self.create_subscriptions(ROWS)
+        for path in ('/api/recipes/',
+                     f'/api/recipes/{self.recipe.id}/',
+                     f'/api/recipes/{self.recipe.id}/similar/',
+                     '/api/recipes/popular/',
+                     '/api/users/',
+                     f'/api/users/{self.recipe.author_id}/',
+                     '/api/users/me/',
+                     '/api/users/subscriptions/',
+                     '/api/ingredients/'):
+            with self.subTest(path=path):
+                self.assert_within_budget(path)
@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.test import TestCase
+from django.utils import timezone
+
+from recipes.models import Recipe, RecipeEngagement
+from ..objectcache import recipe_cache
+from ..popularity import current_bucket, leaderboards
+from .test_query_counts import create_ingredients, create_recipe, create_user
+from .utils import cold_caches
+
+
+def hide_elsewhere(recipe):
+    """Скрывает рецепт так, как это сделал бы другой процесс: индексы
+    и рейтинги этого процесса о нем не узнают.
+    """
+    Recipe.objects.filter(pk=recipe.id).update(deleted_at=timezone.now())
+    for cache in caches.all():
+        cache.clear()
+    recipe_cache.local.clear()
+
+
+class RankingTests(TestCase):
+    """Скрытые рецепты отбрасываются до среза по ``limit``."""
+
+    def setUp(self):
+        cold_caches()
+        ingredients = create_ingredients(3)
+        self.target = create_recipe(create_user(), ingredients)
+        self.recipes = [create_recipe(create_user(), ingredients)
+                        for _ in range(3)]
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return [recipe['id'] for recipe in response.json()]
+
+    def test_popular_recipes(self):
+        bucket = current_bucket() - timedelta(hours=2)
+        for favorites, recipe in enumerate(self.recipes, 1):
+            RecipeEngagement.objects.create(recipe=recipe, bucket=bucket,
+                                            favorites=favorites)
+        path = '/api/recipes/popular/?window=all&limit=2'
+        top = self.recipes[-1]
+        self.assertEqual(self.ids(self.client.get(path))[0], top.id)
+        hide_elsewhere(top)
+        ids = self.ids(self.client.get(path))
+        self.assertEqual(len(ids), 2)
+        self.assertNotIn(top.id, ids)
+        self.assertNotIn(top.id, leaderboards['all']._totals)
+
+    def test_similar_recipes(self):
+        path = f'/api/recipes/{self.target.id}/similar/?limit=2'
+        first = self.ids(self.client.get(path))[0]
+        hide_elsewhere(Recipe.objects.get(pk=first))
+        ids = self.ids(self.client.get(path))
+        self.assertEqual(len(ids), 2)
+        self.assertNotIn(first, ids)
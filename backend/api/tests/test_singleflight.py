@@ -0,0 +1,68 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from .. import singleflight
+from ..singleflight import Entry, SingleFlight
+from .utils import cold_caches
+
+
+class SingleFlightTests(TestCase):
+
+    def setUp(self):
+        cold_caches()
+        settings = override_settings(SINGLE_FLIGHT_WAIT=0.05,
+                                     SINGLE_FLIGHT_POLL=0.01)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.flight = SingleFlight('tests', 60)
+        self.computed = []
+
+    def compute(self, value):
+        def compute():
+            self.computed.append(value)
+            return value
+        return compute
+
+    def hold_lease(self):
+        # Аренду держит другой процесс.
+        cache.add(self.flight.lease_key('key'), 1)
+        self.addCleanup(cache.delete, self.flight.lease_key('key'))
+
+    def test_fresh_value_is_not_recomputed(self):
+        self.assertEqual(self.flight.get('key', self.compute('a'), 1), 'a')
+        self.assertEqual(self.flight.get('key', self.compute('b'), 1), 'a')
+        self.assertEqual(self.computed, ['a'])
+
+    def test_new_version_is_computed_by_lease_holder(self):
+        self.flight.get('key', self.compute('a'), 1)
+        self.assertEqual(
+            self.flight.get_versioned('key', self.compute('b'), 2), ('b', 2))
+        self.assertEqual(self.computed, ['a', 'b'])
+
+    def test_stale_value_is_served_while_lease_is_held(self):
+        self.flight.get('key', self.compute('a'), 1)
+        self.hold_lease()
+        self.assertEqual(
+            self.flight.get_versioned('key', self.compute('b'), 2), ('a', 1))
+        self.assertEqual(self.computed, ['a'])
+
+    def test_waits_for_lease_holder_without_stale_value(self):
+        self.hold_lease()
+
+        def publish(_):
+            cache.set(self.flight.key('key'), Entry('a', 1, 2 ** 40, 0))
+
+        with mock.patch.object(singleflight.time, 'sleep',
+                               side_effect=publish):
+            self.assertEqual(
+                self.flight.get_versioned('key', self.compute('b'), 1),
+                ('a', 1))
+        self.assertEqual(self.computed, [])
+
+    def test_computes_itself_when_lease_holder_is_late(self):
+        self.hold_lease()
+        self.assertEqual(
+            self.flight.get_versioned('key', self.compute('b'), 1), ('b', 1))
+        self.assertEqual(self.computed, ['b'])
@@ -0,0 +1,43 @@
+import os
+import tempfile
+import time
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+from ..storage import delete_if_orphaned
+
+
+class ContentAddressedStorageTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name,
+                                     MEDIA_ORPHAN_GRACE=60)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def age(self, name, seconds):
+        moment = time.time() - seconds
+        os.utime(default_storage.path(name), (moment, moment))
+
+    def test_repeated_upload_refreshes_file(self):
+        name = default_storage.save('recipes/images/a.png',
+                                    ContentFile(b'image'))
+        self.age(name, 120)
+        again = default_storage.save('recipes/images/b.png',
+                                     ContentFile(b'image'))
+        self.assertEqual(again, name)
+        self.assertGreater(delete_if_orphaned(name), 0)
+        self.assertTrue(default_storage.exists(name))
+
+    def test_orphan_is_deleted_after_grace(self):
+        name = default_storage.save('recipes/images/a.png',
+                                    ContentFile(b'image'))
+        self.age(name, 120)
+        self.assertEqual(delete_if_orphaned(name), 0)
+        self.assertFalse(default_storage.exists(name))
+        self.assertEqual(os.listdir(default_storage.path('recipes/images')),
+                         [])
@@ -0,0 +1,76 @@
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription
+from ..models import Change
+from .test_query_counts import create_recipe, create_user
+from .utils import cold_caches
+
+
+class ToggleTests(TestCase):
+    """Добавление и удаление в избранное, список покупок и подписки."""
+
+    def setUp(self):
+        cold_caches()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user)}')
+        self.author = create_user()
+        self.recipe = create_recipe(self.author, [])
+
+    def assert_toggle(self, path, model, **lookups):
+        response = self.client.post(path)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(model.objects.filter(**lookups).exists())
+        response = self.client.post(path)
+        self.assertEqual(response.status_code, 400, response.content)
+        response = self.client.delete(path)
+        self.assertEqual(response.status_code, 204, response.content)
+        self.assertFalse(model.objects.filter(**lookups).exists())
+        response = self.client.delete(path)
+        self.assertEqual(response.status_code, 400, response.content)
+
+    def test_favorite(self):
+        self.assert_toggle(f'/api/recipes/{self.recipe.id}/favorite/',
+                           Favorite, user=self.user, recipe=self.recipe)
+
+    def test_shopping_cart(self):
+        self.assert_toggle(f'/api/recipes/{self.recipe.id}/shopping_cart/',
+                           ShoppingCart, user=self.user, recipe=self.recipe)
+
+    def test_subscribe(self):
+        self.assert_toggle(f'/api/users/{self.author.id}/subscribe/',
+                           Subscription, follower=self.user,
+                           following=self.author)
+
+    def test_delete_is_recorded_with_id(self):
+        favorite = Favorite.objects.create(user=self.user, recipe=self.recipe)
+        response = self.client.delete(
+            f'/api/recipes/{self.recipe.id}/favorite/')
+        self.assertEqual(response.status_code, 204)
+        change = Change.objects.filter(operation=Change.DELETE).get()
+        self.assertEqual(change.object_id, favorite.id)
+        self.assertEqual(change.key, {'user_id': self.user.id,
+                                      'recipe_id': self.recipe.id})
+
+    def test_missing_target(self):
+        for path in ('/api/recipes/0/favorite/',
+                     '/api/recipes/0/shopping_cart/',
+                     '/api/users/0/subscribe/'):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.post(path).status_code, 404)
+
+    def test_hidden_recipe(self):
+        self.client.get(f'/api/recipes/{self.recipe.id}/')
+        Recipe.objects.filter(pk=self.recipe.id).update(
+            deleted_at=timezone.now())
+        for path in (f'/api/recipes/{self.recipe.id}/favorite/',
+                     f'/api/recipes/{self.recipe.id}/shopping_cart/'):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.post(path).status_code, 404)
+        self.assertFalse(Favorite.objects.exists())
+        self.assertFalse(ShoppingCart.objects.exists())
@@ -0,0 +1,58 @@
+from django.core.cache import caches
+from django.db import connection
+
+from ..catalogue import ingredient_catalogue
+from ..ingredient_index import ingredient_index
+from ..objectcache import recipe_cache, user_cache
+from ..popularity import leaderboards
+from ..querybudget import QueryCounter
+from ..similarity import similarity_index
+
+
+def cold_caches():
+    """Сбрасывает общий кеш и все состояние процесса, как после
+    перезапуска: замер после него показывает худший случай.
+    """
+    for cache in caches.all():
+        cache.clear()
+    recipe_cache.local.clear()
+    user_cache.local.clear()
+    ingredient_catalogue._snapshot = None
+    ingredient_index._built_at = None
+    similarity_index._loaded_at = None
+    for leaderboard in leaderboards.values():
+        leaderboard._end = None
+
+
+def count_queries(client, path, **extra):
+    """Ответ и SQL запросов к базе, посчитанных так же,
+    как в ``QueryBudgetMiddleware``.
+    """
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        response = client.get(path, **extra)
+    return response, counter.queries
+
+
+def assert_constant_queries(client, path, create_rows, rows=10, **extra):
+    """Проверка на N+1: ``create_rows(count)`` добавляет строки, запрос
+    выполняется при одной строке и при ``rows`` строках, число запросов
+    к базе должно совпасть.
+
+    Каждый замер делается повторным запросом, чтобы прогрев кешей
+    первым вызовом не искажал сравнение.
+    """
+    counts = []
+    for count in (1, rows - 1):
+        create_rows(count)
+        client.get(path, **extra)
+        response, queries = count_queries(client, path, **extra)
+        if response.status_code != 200:
+            raise AssertionError(f'{path}: статус {response.status_code}')
+        counts.append(queries)
+    single, many = counts
+    if len(single) != len(many):
+        raise AssertionError(
+            f'{path}: {len(single)} запросов при 1 строке и {len(many)} '
+            f'при {rows}:\n' + '\n'.join(many))
+    return len(many)
@@ -0,0 +1,93 @@
+import math
+import time
+
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+
+class BucketThrottle(BaseThrottle):
+    """Ограничение частоты запросов по области (scope) и пользователю/IP.
+
+    Ведро емкостью ``num_requests`` равномерно пополняется за ``duration``.
+    Состояние — два счетчика скользящего окна в общем кеше, которые
+    меняются только атомарным ``incr``, поэтому проверка не требует
+    блокировок и укладывается в два обращения к кешу.
+    """
+
+    scope = None
+    cache_alias = 'throttle'
+    parse_rate = SimpleRateThrottle.parse_rate
+
+    def __init__(self):
+        self.num_requests, self.duration = self.parse_rate(
+            api_settings.DEFAULT_THROTTLE_RATES.get(self.scope))
+        self.cache = caches[self.cache_alias]
+        self._wait = None
+
+    def applies(self, request, view):
+        return self.num_requests is not None
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return f'throttle:{self.scope}:{ident}'
+
+    def increment(self, key):
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            if self.cache.add(key, 1, self.duration * 2):
+                return 1
+            return self.cache.incr(key)
+
+    def allow_request(self, request, view):
+        if not self.applies(request, view):
+            return True
+        now = time.time()
+        window, elapsed = divmod(now, self.duration)
+        fraction = elapsed / self.duration
+        base = self.get_cache_key(request, view)
+        current = self.increment(f'{base}:{int(window)}')
+        previous = self.cache.get(f'{base}:{int(window) - 1}', 0)
+        used = previous * (1 - fraction) + current
+        if used <= self.num_requests:
+            return True
+        if current > self.num_requests or not previous:
+            self._wait = (1 - fraction) * self.duration
+        else:
+            free_at = 1 - (self.num_requests - current) / previous
+            self._wait = max(free_at - fraction, 0) * self.duration
+        return False
+
+    def wait(self):
+        if self._wait is None:
+            return None
+        return max(1, math.ceil(self._wait))
+
+
+class AutocompleteThrottle(BucketThrottle):
+    scope = 'autocomplete'
+
+
+class WriteThrottle(BucketThrottle):
+    scope = 'writes'
+
+    def applies(self, request, view):
+        return (request.method not in SAFE_METHODS
+                and super().applies(request, view))
+
+
+class ExportThrottle(BucketThrottle):
+    scope = 'exports'
+
+
+class AuthThrottle(BucketThrottle):
+    scope = 'auth'
+
+    def applies(self, request, view):
+        return (request.method not in SAFE_METHODS
+                and super().applies(request, view))
@@ -0,0 +1,96 @@
+from django.db import connections, router, transaction
+
+from .changes import NATURAL_KEYS, is_tracked, natural_key, record_changes
+from .models import Change
+from .versions import bump_table_version
+
+
+def insert_once(model, visible=None, **values):
+    """Один запрос ``INSERT ... ON CONFLICT DO NOTHING RETURNING``.
+
+    Возвращает первичный ключ новой записи или ``None``, если такая
+    запись уже есть или ``visible`` (queryset связанной записи) пуст:
+    проверка видимости выполняется тем же запросом,
+    ``INSERT ... SELECT ... WHERE EXISTS``. Отсутствующая связанная
+    запись без ``visible`` приводит к ``IntegrityError`` нарушения
+    внешнего ключа.
+    """
+    db = router.db_for_write(model)
+    connection = connections[db]
+    quote = connection.ops.quote_name
+    fields = [field for field in model._meta.concrete_fields
+              if not field.primary_key]
+    columns, params = [], []
+    for field in fields:
+        if field.attname in values:
+            value = values[field.attname]
+        elif getattr(field, 'auto_now_add', False):
+            value = field.pre_save(model(), add=True)
+        else:
+            continue
+        columns.append(quote(field.column))
+        params.append(field.get_db_prep_save(value, connection))
+    placeholders = ', '.join(['%s'] * len(params))
+    if visible is None:
+        source = f'VALUES ({placeholders})'
+    else:
+        guard, guard_params = visible.values('pk').query.get_compiler(
+            db).as_sql()
+        source = f'SELECT {placeholders} WHERE EXISTS ({guard})'
+        params.extend(guard_params)
+    sql = (
+        f'INSERT INTO {quote(model._meta.db_table)} '
+        f'({", ".join(columns)}) {source} '
+        f'ON CONFLICT DO NOTHING '
+        f'RETURNING {quote(model._meta.pk.column)}'
+    )
+    # Внешние ключи Django объявляет отложенными: ошибка возникает
+    # при фиксации транзакции, поэтому вставка выполняется в своей.
+    with transaction.atomic(using=db):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+    if row is None:
+        return None
+    bump_table_version(model._meta.db_table)
+    if is_tracked(model):
+        record_changes(model, Change.SAVE, ids=[row[0]])
+    return row[0]
+
+
+def delete_existing(model, **lookups):
+    """Один запрос ``DELETE ... RETURNING``; возвращает количество
+    удаленных строк.
+    """
+    db = router.db_for_write(model)
+    connection = connections[db]
+    quote = connection.ops.quote_name
+    conditions, params = [], []
+    for name, value in lookups.items():
+        field = model._meta.get_field(name)
+        conditions.append(f'{quote(field.column)} = %s')
+        params.append(field.get_db_prep_value(value, connection))
+    pk = model._meta.pk.attname
+    returned = [pk]
+    if is_tracked(model):
+        returned += [name for name in NATURAL_KEYS[model]
+                     if name not in returned]
+    columns = [quote(model._meta.get_field(name).column)
+               for name in returned]
+    sql = (
+        f'DELETE FROM {quote(model._meta.db_table)} '
+        f'WHERE {" AND ".join(conditions)} '
+        f'RETURNING {", ".join(columns)}'
+    )
+    with transaction.atomic(using=db):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = [dict(zip(returned, row)) for row in cursor.fetchall()]
+        if rows:
+            bump_table_version(model._meta.db_table)
+            if is_tracked(model):
+                record_changes(
+                    model, Change.DELETE,
+                    ids=[values[pk] for values in rows],
+                    keys=[natural_key(model, values) for values in rows])
+    return len(rows)
@@ -1,4 +1,7 @@
-from django.urls import include, path
+from django.urls import include, path, re_path
+from djoser.views import TokenCreateView
+from .events import event_stream
+from .throttling import AuthThrottle
 from .views import (UserListCreateView, UserDetailView, RecipeListCreateView,
                     RecipeDetailView, IngredientListView, IngredientDetailView,
                     SubscriptionListCreateView, SubscriptionDetailView,
@@ -7,7 +10,10 @@ from .views import (UserListCreateView, UserDetailView, RecipeListCreateView,
                     CurrentUserView, UserAvatarView, SetPasswordView,
                     SubscribeView, SubscriptionsListView,
                     DownloadShoppingCartView, GetShortLinkView,
-                    FavoriteAddView, ShoppingCartAddView)
+                    FavoriteAddView, ShoppingCartAddView, WhatToCookView,
+                    SimilarRecipesView, PopularRecipesView,
+                    ProfileListView, ProfileDownloadView, ChangeFeedView,
+                    RecipeImportView)
 
 
 urlpatterns = [
@@ -30,6 +36,14 @@ urlpatterns = [
          name='shopping-cart-add'),
     path('recipes/download_shopping_cart/',
          DownloadShoppingCartView.as_view(), name='download-shopping-cart'),
+    path('recipes/import/', RecipeImportView.as_view(),
+         name='recipe-import'),
+    path('recipes/what_to_cook/', WhatToCookView.as_view(),
+         name='what-to-cook'),
+    path('recipes/popular/', PopularRecipesView.as_view(),
+         name='popular-recipes'),
+    path('recipes/<int:pk>/similar/', SimilarRecipesView.as_view(),
+         name='similar-recipes'),
     path('recipes/<int:id>/get-link/',
          GetShortLinkView.as_view(), name='get-short-link'),
     path('ingredients/', IngredientListView.as_view(), name='ingredient-list'),
@@ -46,5 +60,13 @@ urlpatterns = [
          name='shoppingcart-list'),
     path('shopping_carts/<int:pk>/', ShoppingCartDetailView.as_view(),
          name='shoppingcart-detail'),
+    path('changes/', ChangeFeedView.as_view(), name='change-feed'),
+    path('events/', event_stream, name='events'),
+    path('profiles/', ProfileListView.as_view(), name='profile-list'),
+    path('profiles/<str:url_name>/<str:filename>/',
+         ProfileDownloadView.as_view(), name='profile-download'),
+    re_path(r'^auth/token/login/?$',
+            TokenCreateView.as_view(throttle_classes=[AuthThrottle]),
+            name='login'),
     path('auth/', include('djoser.urls.authtoken')),
 ]
@@ -0,0 +1,35 @@
+from django.core.cache import cache
+from django.db import transaction
+
+
+def table_version_key(table):
+    return f'table-version:{table}'
+
+
+def get_table_version(table):
+    return cache.get(table_version_key(table), 0)
+
+
+def get_table_versions(tables):
+    versions = cache.get_many([table_version_key(table) for table in tables])
+    return tuple(versions.get(table_version_key(table), 0)
+                 for table in tables)
+
+
+def increment(key):
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+def bump_table_version(table):
+    """Меняет версию таблицы сразу и, внутри транзакции, еще раз после
+    коммита: иначе процесс, прочитавший старые строки до коммита,
+    сохранил бы их под новой версией.
+    """
+    key = table_version_key(table)
+    increment(key)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: increment(key))
@@ -1,9 +1,16 @@
+import hashlib
+
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import (IsAuthenticatedOrReadOnly, AllowAny,
-                                        IsAuthenticated)
+                                        IsAuthenticated, IsAdminUser)
 from django.shortcuts import get_object_or_404, redirect
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified, StreamingHttpResponse)
+from django.utils.cache import patch_cache_control
 from users.models import CustomUser, Subscription
 from recipes.models import (Recipe, Ingredient, Favorite,
                             ShoppingCart, RecipeIngredient)
@@ -13,17 +20,103 @@ from .serializers import (UserSerializer, UserCreateSerializer,
                           IngredientSerializer, SubscriptionSerializer,
                           FavoriteSerializer, ShoppingCartSerializer,
                           RecipeCreateUpdateSerializer,
-                          RecipeMinifiedSerializer)
+                          RecipeMinifiedSerializer, RecipeCoverageSerializer,
+                          RecipeSimilarSerializer, RecipePopularSerializer)
 from .permissions import (CanEditRecipeOrReadOnly, CanDownloadShoppingCart)
 from django_filters.rest_framework import DjangoFilterBackend
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import CustomPagination
+from .pagination import CustomPagination, CachedCountPagination
 from django.db.models import Sum
-
-
+from django.conf import settings
+from .ingredient_index import ingredient_index
+from .similarity import similarity_index
+from .popularity import (WINDOWS, discard_popular, popular_recipes,
+                         record_engagement)
+from .toggles import delete_existing, insert_once
+from .catalogue import ingredient_catalogue, matching_etag
+from .throttling import AuthThrottle, AutocompleteThrottle, ExportThrottle
+from .tasks import purge_recipe, purge_user
+from .versions import bump_table_version, get_table_versions
+from .objectcache import recipe_cache, user_cache
+from .changes import (current_cursor, iter_changes, iter_snapshot, ndjson,
+                      parse_models, record_changes)
+from .models import Change
+from .importer import READERS, RecipeImporter
+from .profiling import make_profile_token, profile_path, profiles_root
+from .warmup import probe_database, warm_up
+from .querybudget import query_budget
+from .singleflight import SingleFlight
+
+# Данные авторов на странице могут отставать на время жизни записи:
+# версия таблицы пользователей меняется при каждом входе.
+RECIPE_PAGE_TABLES = (Recipe._meta.db_table, RecipeIngredient._meta.db_table,
+                      Ingredient._meta.db_table)
+recipe_pages = SingleFlight('recipe-page', settings.RECIPE_PAGE_CACHE_TIMEOUT)
+
+
+def discard_from_indexes(recipe_ids):
+    # Скрытый рецепт убирается из индексов процесса сразу после
+    # коммита, не дожидаясь фоновой очистки.
+    def discard():
+        ingredient_index.discard(recipe_ids)
+        similarity_index.discard(recipe_ids)
+        discard_popular(recipe_ids)
+
+    transaction.on_commit(discard)
+
+
+def visible_ranking(ranking, limit, attribute, include=()):
+    """Первые ``limit`` видимых рецептов рейтинга ``[(id, оценка)]``
+    с оценкой в атрибуте ``attribute``.
+
+    Рейтинг читается порциями по ``limit``, пока не наберется нужное
+    число: скрытые и удаленные рецепты отбрасываются до среза, а не
+    после. Рецепты ``include`` читаются вместе с первой порцией.
+
+    Возвращает найденные рецепты, словарь рецептов ``include`` (``None``
+    для невидимых) и id отброшенных рецептов.
+    """
+    results, missing = [], []
+    included = {}
+    start = 0
+    while True:
+        chunk = ranking[start:start + limit]
+        recipes = recipe_cache.get_many(
+            [*include, *(recipe_id for recipe_id, _ in chunk)])
+        if not start:
+            included = {recipe_id: recipes.get(recipe_id)
+                        for recipe_id in include}
+        for recipe_id, score in chunk:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                missing.append(recipe_id)
+            elif len(results) < limit:
+                setattr(recipe, attribute, score)
+                results.append(recipe)
+        start += limit
+        if len(results) >= limit or start >= len(ranking):
+            return results, included, missing
+        include = ()
+
+
+def parse_id_list(value):
+    try:
+        return [int(item) for item in value.split(',') if item.strip()]
+    except ValueError:
+        return None
+
+
+@query_budget(GET=3)
 class UserListCreateView(generics.ListCreateAPIView):
-    queryset = CustomUser.objects.all()
+    queryset = CustomUser.objects.filter(deleted_at__isnull=True)
     permission_classes = [AllowAny]
+    throttle_classes = [AuthThrottle]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method == 'GET':
+            queryset = UserSerializer.optimize_queryset(queryset, self.request)
+        return queryset
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -31,24 +124,91 @@ class UserListCreateView(generics.ListCreateAPIView):
         return UserSerializer
 
 
+@query_budget(GET=2)
 class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = CustomUser.objects.all()
+    queryset = CustomUser.objects.filter(deleted_at__isnull=True)
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
-
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method == 'GET':
+            queryset = UserSerializer.optimize_queryset(queryset, self.request)
+        return queryset
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # Пользователь и его рецепты скрываются сразу, а строки
+        # удаляются фоновой задачей небольшими пачками.
+        now = timezone.now()
+        CustomUser.objects.filter(pk=instance.pk).update(
+            deleted_at=now, is_active=False)
+        recipe_ids = list(Recipe.objects.filter(
+            author=instance).values_list('id', flat=True))
+        Recipe.objects.filter(id__in=recipe_ids).update(deleted_at=now)
+        bump_table_version(CustomUser._meta.db_table)
+        user_cache.invalidate(instance.pk)
+        if recipe_ids:
+            bump_table_version(Recipe._meta.db_table)
+            recipe_cache.invalidate(*recipe_ids)
+            record_changes(Recipe, Change.DELETE, ids=recipe_ids)
+            discard_from_indexes(recipe_ids)
+        purge_user.enqueue(instance.pk,
+                           idempotency_key=f'purge-user:{instance.pk}')
+
+
+@query_budget(GET=5)
 class RecipeListCreateView(generics.ListCreateAPIView):
     queryset = Recipe.objects.all().order_by('-pub_date')
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
-    pagination_class = CustomPagination
+    pagination_class = CachedCountPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method == 'GET':
+            queryset = RecipeSerializer.optimize_queryset(
+                queryset, self.request)
+        return queryset
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return RecipeCreateUpdateSerializer
         return RecipeSerializer
 
+    def list(self, request, *args, **kwargs):
+        if 'ids' in request.query_params:
+            return self.list_by_ids(request)
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        # Анонимная страница одинакова для всех и кешируется целиком;
+        # после изменений ее пересчитывает один запрос.
+        render = super().list
+        key = hashlib.md5(
+            request.build_absolute_uri().encode()).hexdigest()
+        data = recipe_pages.get(
+            key, lambda: render(request, *args, **kwargs).data,
+            get_table_versions(RECIPE_PAGE_TABLES))
+        return Response(data)
+
+    def list_by_ids(self, request):
+        ids = parse_id_list(request.query_params['ids'])
+        if not ids or len(ids) > settings.RECIPES_BY_IDS_MAX:
+            return Response(
+                {'error': 'Укажите до {} id рецептов через запятую'.format(
+                    settings.RECIPES_BY_IDS_MAX)},
+                status=status.HTTP_400_BAD_REQUEST)
+        # Набор рецептов задан явно: без пагинации и COUNT(*),
+        # порядок ответа совпадает с порядком id в запросе.
+        ids = list(dict.fromkeys(ids))
+        recipes = {recipe.pk: recipe for recipe in self.filter_queryset(
+            self.get_queryset()).filter(id__in=ids).order_by()}
+        recipes = [recipes[pk] for pk in ids if pk in recipes]
+        serializer = self.get_serializer(recipes, many=True)
+        return Response({'count': len(recipes), 'next': None,
+                         'previous': None, 'results': serializer.data})
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -62,10 +222,19 @@ class RecipeListCreateView(generics.ListCreateAPIView):
                         status=status.HTTP_201_CREATED)
 
 
+@query_budget(GET=6)
 class RecipeDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Recipe.objects.all()
     permission_classes = [CanEditRecipeOrReadOnly]
 
+    def get_object(self):
+        if self.request.method != 'GET':
+            return super().get_object()
+        recipe = recipe_cache.get_or_404(self.kwargs['pk'])
+        self.check_object_permissions(self.request, recipe)
+        RecipeSerializer.attach_user_flags([recipe], self.request)
+        return recipe
+
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
             return RecipeCreateUpdateSerializer
@@ -84,7 +253,117 @@ class RecipeDetailView(generics.RetrieveUpdateDestroyAPIView):
         )
         return Response(response_serializer.data)
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        Recipe.objects.filter(pk=instance.pk).update(
+            deleted_at=timezone.now())
+        bump_table_version(Recipe._meta.db_table)
+        recipe_cache.invalidate(instance.pk)
+        record_changes(Recipe, Change.DELETE, ids=[instance.pk])
+        discard_from_indexes([instance.pk])
+        purge_recipe.enqueue(instance.pk,
+                             idempotency_key=f'purge-recipe:{instance.pk}')
+
+
+class WhatToCookView(generics.GenericAPIView):
+    serializer_class = RecipeCoverageSerializer
+    permission_classes = [AllowAny]
+    pagination_class = CustomPagination
+
+    def get(self, request):
+        ingredient_ids = parse_id_list(
+            request.query_params.get('ingredients', ''))
+        if not ingredient_ids:
+            return Response(
+                {'error': 'Укажите id ингредиентов через запятую'},
+                status=status.HTTP_400_BAD_REQUEST)
+        try:
+            min_coverage = float(request.query_params.get(
+                'min_coverage', settings.WHAT_TO_COOK_MIN_COVERAGE))
+        except ValueError:
+            min_coverage = None
+        if min_coverage is None or not 0 < min_coverage <= 1:
+            return Response(
+                {'error': 'min_coverage должен быть в диапазоне (0, 1]'},
+                status=status.HTTP_400_BAD_REQUEST)
+        ranking = ingredient_index.search(ingredient_ids, min_coverage)
+        page = self.paginate_queryset(ranking)
+        recipes = Recipe.objects.select_related('author').prefetch_related(
+            'recipe_ingredients__ingredient'
+        ).in_bulk([recipe_id for recipe_id, _ in page])
+        results = []
+        for recipe_id, coverage in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.coverage = coverage
+                results.append(recipe)
+        if len(results) < len(page):
+            # Рецепт скрыли в другом процессе: индекс этого процесса
+            # узнает о нем только при перестроении.
+            ingredient_index.discard(
+                recipe_id for recipe_id, _ in page
+                if recipe_id not in recipes)
+        serializer = self.get_serializer(results, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+@query_budget(GET=8)
+class SimilarRecipesView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, pk):
+        try:
+            limit = int(request.query_params.get(
+                'limit', CustomPagination.page_size))
+            limit = max(1, min(limit, CustomPagination.max_page_size))
+        except ValueError:
+            return Response({'error': 'limit должен быть числом'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # Сам рецепт и похожие берутся из кеша объектов одним вызовом:
+        # для скрытого или несуществующего рецепта индекс вернет пустой
+        # список.
+        ranking = similarity_index.similar(
+            pk, similarity_index.max_candidates)
+        results, included, missing = visible_ranking(
+            ranking, limit, 'similarity', include=[pk])
+        if included[pk] is None:
+            raise Http404('Рецепт не найден')
+        if missing:
+            similarity_index.discard(missing)
+        RecipeSerializer.attach_user_flags(results, request)
+        serializer = RecipeSimilarSerializer(
+            results, many=True, context={'request': request})
+        return Response(serializer.data)
+
+
+@query_budget(GET=8)
+class PopularRecipesView(APIView):
+    permission_classes = [AllowAny]
 
+    def get(self, request):
+        window = request.query_params.get('window', 'week')
+        if window not in WINDOWS:
+            return Response(
+                {'error': 'window должен быть одним из: '
+                 + ', '.join(WINDOWS)},
+                status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get(
+                'limit', CustomPagination.page_size))
+        except ValueError:
+            return Response({'error': 'limit должен быть числом'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        results, _, missing = visible_ranking(
+            popular_recipes(window), max(1, limit), 'score')
+        if missing:
+            discard_popular(missing)
+        RecipeSerializer.attach_user_flags(results, request)
+        serializer = RecipePopularSerializer(
+            results, many=True, context={'request': request})
+        return Response(serializer.data)
+
+
+@query_budget(GET=3)
 class IngredientListView(generics.ListAPIView):
     serializer_class = IngredientSerializer
     permission_classes = [AllowAny]
@@ -92,6 +371,29 @@ class IngredientListView(generics.ListAPIView):
     filter_backends = [DjangoFilterBackend]
     filterset_class = IngredientFilter
     queryset = Ingredient.objects.all()
+    throttle_classes = [AutocompleteThrottle]
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('name'):
+            return super().list(request, *args, **kwargs)
+        snapshot = ingredient_catalogue.get()
+        matched = matching_etag(request, snapshot.etag)
+        if matched:
+            response = HttpResponseNotModified()
+            response['ETag'] = matched
+        else:
+            response = HttpResponse(snapshot.body,
+                                    content_type='application/json')
+            response.precompressed = snapshot.precompressed
+            response['ETag'] = snapshot.etag
+        if snapshot.stale:
+            # Прежняя версия на время пересборки: клиенту не кешировать.
+            patch_cache_control(response, no_cache=True)
+        else:
+            patch_cache_control(
+                response, public=True,
+                max_age=settings.INGREDIENT_CATALOGUE_MAX_AGE)
+        return response
 
 
 class IngredientDetailView(generics.RetrieveAPIView):
@@ -136,6 +438,7 @@ class ShoppingCartDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
 
 
+@query_budget(GET=2)
 class CurrentUserView(generics.RetrieveAPIView):
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
@@ -163,7 +466,7 @@ class UserAvatarView(APIView):
     def delete(self, request, *args, **kwargs):
         user = request.user
         if user.avatar:
-            user.avatar.delete()
+            user.avatar = None
             user.save()
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response({'error': 'Аватар отсутствует'},
@@ -172,6 +475,7 @@ class UserAvatarView(APIView):
 
 class SetPasswordView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [AuthThrottle]
 
     def post(self, request, *args, **kwargs):
         serializer = SetPasswordSerializer(
@@ -187,45 +491,53 @@ class SubscribeView(APIView):
 
     def post(self, request, id):
         user = request.user
-        author = get_object_or_404(CustomUser, id=id)
-        if user == author:
+        if user.id == id:
             return Response({'error': 'Нельзя подписаться на себя'},
                             status=status.HTTP_400_BAD_REQUEST)
-        if Subscription.objects.filter(follower=user,
-                                       following=author).exists():
+        visible = CustomUser.objects.filter(pk=id, deleted_at__isnull=True)
+        try:
+            created = insert_once(Subscription, visible=visible,
+                                  follower_id=user.id, following_id=id)
+        except IntegrityError:
+            raise Http404('Пользователь не найден')
+        if created is None:
+            if not visible.exists():
+                raise Http404('Пользователь не найден')
             return Response(
                 {'error': 'Вы уже подписаны на этого пользователя'},
                 status=status.HTTP_400_BAD_REQUEST)
-        Subscription.objects.create(follower=user, following=author)
+        author = user_cache.get_or_404(id)
         serializer = UserWithRecipesSerializer(
             author, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, id):
-        user = request.user
-        author = get_object_or_404(CustomUser, id=id)
-        subscription = Subscription.objects.filter(
-            follower=user, following=author)
-        if not subscription.exists():
-            return Response({'error': 'Вы не подписаны на этого пользователя'},
-                            status=status.HTTP_400_BAD_REQUEST)
-        subscription.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        if delete_existing(Subscription, follower_id=request.user.id,
+                           following_id=id):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(CustomUser, id=id)
+        return Response({'error': 'Вы не подписаны на этого пользователя'},
+                        status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(GET=4)
 class SubscriptionsListView(generics.ListAPIView):
     serializer_class = UserWithRecipesSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = CustomPagination
+    pagination_class = CachedCountPagination
 
     def get_queryset(self):
-        return CustomUser.objects.filter(
-            subscribers__follower=self.request.user
-        )
+        return UserWithRecipesSerializer.optimize_queryset(
+            CustomUser.objects.filter(
+                subscribers__follower=self.request.user,
+                deleted_at__isnull=True
+            ).order_by('username'),
+            self.request)
 
 
 class DownloadShoppingCartView(APIView):
     permission_classes = [CanDownloadShoppingCart]
+    throttle_classes = [ExportThrottle]
 
     def get(self, request):
         user = request.user
@@ -255,7 +567,7 @@ class GetShortLinkView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, id):
-        recipe = get_object_or_404(Recipe, id=id)
+        recipe = recipe_cache.get_or_404(id)
         return Response(
             {'short-link': request.build_absolute_uri
              (f'/recipes/{recipe.id}/')},
@@ -267,25 +579,33 @@ class FavoriteAddView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
         user = request.user
-        if Favorite.objects.filter(user=user, recipe=recipe).exists():
+        visible = Recipe.objects.filter(pk=pk)
+        try:
+            with transaction.atomic():
+                created = insert_once(Favorite, visible=visible,
+                                      user_id=user.id, recipe_id=pk)
+                if created is not None:
+                    record_engagement(pk, 'favorites')
+        except IntegrityError:
+            raise Http404('Рецепт не найден')
+        if created is None:
+            if not visible.exists():
+                raise Http404('Рецепт не найден')
             return Response({'error': 'Рецепт уже в избранном'},
                             status=status.HTTP_400_BAD_REQUEST)
-        favorite = Favorite.objects.create(user=user, recipe=recipe)
+        recipe = recipe_cache.get_or_404(pk)
+        favorite = Favorite(id=created, user=user, recipe=recipe)
         serializer = FavoriteSerializer(
             favorite, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        user = request.user
-        favorite = Favorite.objects.filter(user=user, recipe=recipe)
-        if not favorite.exists():
-            return Response({'error': 'Рецепт не в избранном'},
-                            status=status.HTTP_400_BAD_REQUEST)
-        favorite.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        if delete_existing(Favorite, user_id=request.user.id, recipe_id=pk):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(Recipe, id=pk)
+        return Response({'error': 'Рецепт не в избранном'},
+                        status=status.HTTP_400_BAD_REQUEST)
 
 
 class ShortLinkRedirectView(APIView):
@@ -300,22 +620,143 @@ class ShoppingCartAddView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        user = request.user
-        if ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
+        visible = Recipe.objects.filter(pk=pk)
+        try:
+            with transaction.atomic():
+                created = insert_once(ShoppingCart, visible=visible,
+                                      user_id=request.user.id, recipe_id=pk)
+                if created is not None:
+                    record_engagement(pk, 'carts')
+        except IntegrityError:
+            raise Http404('Рецепт не найден')
+        if created is None:
+            if not visible.exists():
+                raise Http404('Рецепт не найден')
             return Response({'error': 'Рецепт уже в списке покупок'},
                             status=status.HTTP_400_BAD_REQUEST)
-        ShoppingCart.objects.create(user=user, recipe=recipe)
+        recipe = recipe_cache.get_or_404(pk)
         serializer = RecipeMinifiedSerializer(
             recipe, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        user = request.user
-        cart_item = ShoppingCart.objects.filter(user=user, recipe=recipe)
-        if not cart_item.exists():
-            return Response({'error': 'Рецепт не в списке покупок'},
+        if delete_existing(ShoppingCart, user_id=request.user.id,
+                           recipe_id=pk):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(Recipe, id=pk)
+        return Response({'error': 'Рецепт не в списке покупок'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+
+class ProfileListView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        root = profiles_root()
+        profiles = []
+        if root.is_dir():
+            for path in sorted(root.glob('*/*')):
+                stat = path.stat()
+                profiles.append({
+                    'url_name': path.parent.name,
+                    'filename': path.name,
+                    'size': stat.st_size,
+                    'created': stat.st_mtime,
+                    'download': request.build_absolute_uri(
+                        f'{request.path}{path.parent.name}/{path.name}/'),
+                })
+        return Response({'enabled': settings.PROFILING_ENABLED,
+                         'mode': settings.PROFILING_MODE,
+                         'token': make_profile_token(),
+                         'profiles': profiles})
+
+
+class ProfileDownloadView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, url_name, filename):
+        path = profile_path(url_name, filename)
+        if path is None:
+            raise Http404('Профиль не найден')
+        return FileResponse(path.open('rb'), as_attachment=True,
+                            filename=filename)
+
+
+class ChangeFeedView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        try:
+            models = parse_models(request.query_params.get('models'))
+        except ValueError as error:
+            return Response({'error': f'Неизвестные модели: {error}'},
                             status=status.HTTP_400_BAD_REQUEST)
-        cart_item.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        cursor = request.query_params.get('cursor')
+        upper = current_cursor()
+        if cursor is None:
+            records = iter_snapshot(models)
+        else:
+            try:
+                records = iter_changes(int(cursor), upper, models)
+            except ValueError:
+                return Response({'error': 'cursor должен быть числом'},
+                                status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(
+            ndjson(records, upper), content_type='application/x-ndjson')
+        response['X-Next-Cursor'] = upper
+        return response
+
+
+class RecipeImportView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        if request.content_type.startswith('multipart/'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({'error': 'Файл не передан'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            stream, name = upload, upload.name
+        else:
+            stream, name = request.stream, ''
+        # ``format`` занят DRF (URL_FORMAT_OVERRIDE), поэтому ``input``.
+        input_format = request.query_params.get('input') or (
+            'csv' if name.endswith('.csv')
+            or request.content_type == 'text/csv' else 'ndjson')
+        if input_format not in READERS or stream is None:
+            return Response(
+                {'error': 'Ожидается NDJSON или CSV: '
+                 + ', '.join(READERS)},
+                status=status.HTTP_400_BAD_REQUEST)
+        importer = RecipeImporter(default_author=request.user)
+        report = importer.run(READERS[input_format](stream))
+        return Response(report)
+
+
+class LiveView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = []
+
+    def get(self, request):
+        return Response({'status': 'alive'})
+
+
+class ReadyView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = []
+
+    def get(self, request):
+        if not warm_up.completed:
+            # Без хуков gunicorn (runserver, другой сервер) прогрев
+            # запускается первой же проверкой готовности.
+            warm_up.start()
+            return Response({'status': 'warming', 'error': warm_up.error},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        latency = probe_database()
+        if latency is None or latency > settings.READY_DB_LATENCY_MAX:
+            return Response({'status': 'degraded', 'db_latency_ms': latency},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({'status': 'ready',
+                         'db_latency_ms': round(latency, 2)})
@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.db import DatabaseError, connections
+from django.test import RequestFactory
+
+from recipes.models import Recipe
+from .catalogue import ingredient_catalogue
+from .ingredient_index import ingredient_index
+from .objectcache import recipe_cache
+from .popularity import WINDOWS, popular_recipes
+from .similarity import similarity_index
+
+logger = logging.getLogger(__name__)
+
+
+def warm_connections():
+    """Открывает соединения со всеми базами в текущем потоке.
+
+    Имеет смысл при ``CONN_MAX_AGE`` > 0: открытое соединение
+    переживет запрос и достанется первому обработчику.
+    """
+    for connection in connections.all():
+        connection.ensure_connection()
+
+
+def probe_database(alias='default'):
+    """Время ``SELECT 1`` в миллисекундах или None, если база недоступна."""
+    started = time.perf_counter()
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except DatabaseError:
+        logger.exception('Проверка базы данных не прошла')
+        return None
+    return (time.perf_counter() - started) * 1000
+
+
+def warm_recipes():
+    recent = list(Recipe.objects.order_by('-pub_date').values_list(
+        'id', flat=True)[:settings.WARMUP_RECIPES])
+    popular = {recipe_id for window in WINDOWS
+               for recipe_id, _ in popular_recipes(window)}
+    recipe_cache.get_many([*recent, *popular])
+
+
+def warm_pages():
+    # Полный проход через middleware и представления подгружает
+    # ленивые импорты DRF и заполняет кеш COUNT(*) первых страниц.
+    # Тестовый Client не годится: на время запроса он глобально
+    # отключает close_old_connections, а прогрев идет параллельно
+    # с обработкой настоящих запросов.
+    host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS
+                 if host != '*'), 'localhost')
+    handler = BaseHandler()
+    handler.load_middleware()
+    factory = RequestFactory(HTTP_HOST=host)
+    for path in settings.WARMUP_PATHS:
+        response = handler.get_response(factory.get(path))
+        response.close()
+        if response.status_code >= 400:
+            raise RuntimeError(f'{path}: статус {response.status_code}')
+
+
+STEPS = (
+    ('connections', warm_connections),
+    ('ingredient_catalogue', ingredient_catalogue.get),
+    ('ingredient_index', ingredient_index.build),
+    ('similarity_index', similarity_index.load),
+    ('recipes', warm_recipes),
+    ('pages', warm_pages),
+)
+
+
+class WarmUp:
+    """Прогрев процесса перед приемом трафика.
+
+    Запускается один раз на обработчик (или в мастере gunicorn
+    при ``preload_app``, тогда обработчики наследуют результат).
+    Пока прогрев не завершился, ``/ready`` отвечает 503.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self.completed_at = None
+        self.report = None
+        self.error = None
+
+    @property
+    def completed(self):
+        return self.completed_at is not None
+
+    def run(self):
+        report = {}
+        try:
+            for name, step in STEPS:
+                started = time.perf_counter()
+                step()
+                report[name] = round(
+                    (time.perf_counter() - started) * 1000, 1)
+        except Exception as error:
+            logger.exception('Прогрев не завершен')
+            self.error = f'{name}: {error}'
+            raise
+        self.report = report
+        self.error = None
+        self.completed_at = time.time()
+        logger.info('Прогрев завершен: %s', report)
+        return report
+
+    def _run_in_thread(self):
+        try:
+            self.run()
+        except Exception:
+            pass
+        finally:
+            connections.close_all()
+
+    def start(self):
+        """Запускает прогрев в фоне, если он не завершен и не идет."""
+        with self._lock:
+            if self.completed or (self._thread is not None
+                                  and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(
+                target=self._run_in_thread, name='warmup', daemon=True)
+            self._thread.start()
+
+
+warm_up = WarmUp()
@@ -49,6 +49,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
+    'api.profiling.ProfilingMiddleware',
+    'api.querylog.SlowQueryMiddleware',
+    'api.querybudget.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -87,7 +91,9 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -95,6 +101,27 @@ DATABASES = {
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
+PASSWORD_HASHER_CLASSES = {
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'scrypt')
+# Первый хешер используется для новых паролей, остальные — только
+# для проверки старых хешей, которые пересчитываются при входе.
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + [
+    path for name, path in PASSWORD_HASHER_CLASSES.items()
+    if name != PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
+AUTHENTICATION_BACKENDS = ['api.hashing.PooledModelBackend']
+
+PASSWORD_HASHING_POOL = os.getenv('PASSWORD_HASHING_POOL', 'thread')
+PASSWORD_HASHING_WORKERS = int(
+    os.getenv('PASSWORD_HASHING_WORKERS', os.cpu_count() or 2))
+PASSWORD_HASHING_QUEUE = int(os.getenv('PASSWORD_HASHING_QUEUE', 16))
+PASSWORD_HASHING_WAIT = 2.0
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.'
@@ -136,6 +163,19 @@ STATIC_ROOT = BASE_DIR / 'static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'api.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+# Файл без ссылок удаляется, только если его не загружали повторно
+# дольше этого срока: ссылку на него может еще записывать
+# незакоммиченная транзакция или пачка импорта.
+MEDIA_ORPHAN_GRACE = int(os.getenv('MEDIA_ORPHAN_GRACE', 3600))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -144,7 +184,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'users.CustomUser'
 
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CustomPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CachedCountPagination',
     'PAGE_SIZE': 6,
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -152,6 +192,19 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.WriteThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'autocomplete': os.getenv('THROTTLE_AUTOCOMPLETE', '120/min'),
+        'writes': os.getenv('THROTTLE_WRITES', '60/min'),
+        'exports': os.getenv('THROTTLE_EXPORTS', '20/hour'),
+        'auth': os.getenv('THROTTLE_AUTH', '10/min'),
+    },
 }
 
 DJOSER = {
@@ -159,6 +212,122 @@ DJOSER = {
         'user_create': 'api.serializers.UserCreateSerializer',
         'user': 'api.serializers.UserSerializer',
         'current_user': 'api.serializers.UserSerializer',
+        'token_create': 'api.serializers.TokenCreateSerializer',
     },
     'LOGIN_FIELD': 'email',
 }
+
+INGREDIENT_INDEX_MAX_ENTRIES = int(
+    os.getenv('INGREDIENT_INDEX_MAX_ENTRIES', 2_000_000))
+INGREDIENT_INDEX_MAX_AGE = int(os.getenv('INGREDIENT_INDEX_MAX_AGE', 600))
+WHAT_TO_COOK_MIN_COVERAGE = 0.5
+
+SIMILAR_RECIPES_NUM_PERM = 128
+SIMILAR_RECIPES_BANDS = 32
+SIMILAR_RECIPES_MAX_CANDIDATES = 200
+SIMILAR_RECIPES_MAX_AGE = int(os.getenv('SIMILAR_RECIPES_MAX_AGE', 600))
+
+RECIPES_BY_IDS_MAX = 100
+RECIPE_PAGE_CACHE_TIMEOUT = int(os.getenv('RECIPE_PAGE_CACHE_TIMEOUT', 30))
+
+# Версии таблиц, счетчики, ограничения частоты и аренды пересчета
+# должны быть общими для всех процессов (веб, фоновые задачи, ASGI,
+# команды управления) и меняться атомарным ``incr``, поэтому нужен
+# Redis. Кеш в базе (DatabaseCache) поддерживается, но его ``incr`` —
+# чтение и запись, и при параллельных запросах счетчики теряют
+# приращения (см. проверку api.W001).
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND', 'django.core.cache.backends.redis.RedisCache')
+CACHE_IS_REDIS = 'redis' in CACHE_BACKEND
+CACHE_OPTIONS = {} if CACHE_IS_REDIS else {'MAX_ENTRIES': 100_000}
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            'redis://127.0.0.1:6379/0' if CACHE_IS_REDIS
+            else 'foodgram_cache'),
+        'OPTIONS': CACHE_OPTIONS,
+    },
+    'throttle': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv(
+            'THROTTLE_CACHE_LOCATION',
+            'redis://127.0.0.1:6379/1' if CACHE_IS_REDIS
+            else 'foodgram_throttle_cache'),
+        'OPTIONS': CACHE_OPTIONS,
+    },
+}
+
+POPULAR_RECIPES_TOP = 60
+POPULAR_RECIPES_STALENESS = int(os.getenv('POPULAR_RECIPES_STALENESS', 60))
+
+PAGINATION_COUNT_TIMEOUT = int(os.getenv('PAGINATION_COUNT_TIMEOUT', 300))
+PAGINATION_APPROXIMATE_THRESHOLD = int(
+    os.getenv('PAGINATION_APPROXIMATE_THRESHOLD', 100_000))
+
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+INGREDIENT_CATALOGUE_MAX_AGE = int(
+    os.getenv('INGREDIENT_CATALOGUE_MAX_AGE', 3600))
+INGREDIENT_CATALOGUE_PRECOMPRESS = True
+INGREDIENT_CATALOGUE_SNAPSHOT_MAX_AGE = int(
+    os.getenv('INGREDIENT_CATALOGUE_SNAPSHOT_MAX_AGE', 60))
+
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 4))
+JOBS_POLL_INTERVAL = 1.0
+JOBS_MAX_ATTEMPTS = 5
+JOBS_BACKOFF_BASE = 5
+JOBS_BACKOFF_MAX = 3600
+JOBS_LOCK_TIMEOUT = 600
+JOBS_RETENTION_DAYS = 7
+
+PURGE_BATCH_SIZE = int(os.getenv('PURGE_BATCH_SIZE', 500))
+
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_MODE = os.getenv('PROFILING_MODE', 'cprofile')
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+PROFILING_SAMPLER_INTERVAL = 0.005
+PROFILING_TOKEN_MAX_AGE = 3600
+PROFILING_MAX_FILES = 20
+PROFILING_DIR = os.getenv('PROFILING_DIR', BASE_DIR / 'profiles')
+
+SLOW_QUERY_LOG_ENABLED = os.getenv('SLOW_QUERY_LOG_ENABLED', 'False') == 'True'
+SLOW_QUERY_THRESHOLD = float(os.getenv('SLOW_QUERY_THRESHOLD', 100))
+SLOW_QUERY_EXPLAIN_ANALYZE = (
+    os.getenv('SLOW_QUERY_EXPLAIN_ANALYZE', 'False') == 'True')
+
+OBJECT_CACHE_VERSION = 1
+OBJECT_CACHE_TIMEOUT = int(os.getenv('OBJECT_CACHE_TIMEOUT', 300))
+OBJECT_CACHE_LOCAL_SIZE = 1024
+OBJECT_CACHE_LOCAL_TTL = 5
+
+CHANGES_CHUNK_SIZE = int(os.getenv('CHANGES_CHUNK_SIZE', 2000))
+
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 500))
+IMPORT_IMAGE_WORKERS = int(os.getenv('IMPORT_IMAGE_WORKERS', 4))
+IMPORT_MAX_REPORTED_ERRORS = 1000
+
+WARMUP_RECIPES = int(os.getenv('WARMUP_RECIPES', 60))
+WARMUP_PATHS = ['/api/ingredients/', '/api/recipes/']
+READY_DB_LATENCY_MAX = float(os.getenv('READY_DB_LATENCY_MAX', 250))
+
+QUERY_BUDGET_ENABLED = os.getenv('QUERY_BUDGET_ENABLED', 'True') == 'True'
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', str(DEBUG)) == 'True'
+
+EVENTS_POLL_INTERVAL = float(os.getenv('EVENTS_POLL_INTERVAL', 1.0))
+EVENTS_HEARTBEAT = 15
+EVENTS_RETRY = 3000
+EVENTS_MAX_PENDING = 100
+EVENTS_MAX_RECIPES = 100
+
+SINGLE_FLIGHT_LEASE_TIMEOUT = 10
+SINGLE_FLIGHT_WAIT = 0.5
+SINGLE_FLIGHT_POLL = 0.02
+SINGLE_FLIGHT_BETA = 1.0
+SINGLE_FLIGHT_STALE_GRACE = int(os.getenv('SINGLE_FLIGHT_STALE_GRACE', 300))
+
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
@@ -1,8 +1,12 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from api.views import LiveView, ReadyView
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('live', LiveView.as_view()),
+    path('ready', ReadyView.as_view()),
 ]
@@ -0,0 +1,28 @@
+import os
+
+bind = '0.0.0.0:8000'
+preload_app = os.getenv('GUNICORN_PRELOAD', 'False') == 'True'
+
+
+def when_ready(server):
+    # С preload_app приложение уже загружено в мастере: прогреваем
+    # один раз, обработчики унаследуют кеши после fork. Соединения
+    # с базой нельзя делить между процессами, поэтому закрываем их.
+    if not preload_app:
+        return
+    from django.db import connections
+
+    from api.warmup import warm_up
+
+    try:
+        warm_up.run()
+    except Exception:
+        server.log.exception('Прогрев в мастере не удался')
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    from api.warmup import warm_connections, warm_up
+
+    warm_connections()
+    warm_up.start()
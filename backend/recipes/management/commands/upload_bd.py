@@ -3,6 +3,7 @@ from pathlib import Path
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from recipes.models import Ingredient
+from api.versions import bump_table_version
 
 
 class Command(BaseCommand):
@@ -26,6 +27,7 @@ class Command(BaseCommand):
                 Ingredient.objects.bulk_create(
                     new_ingredients, ignore_conflicts=True)
                 added_count = Ingredient.objects.count() - existing_count
+                bump_table_version(Ingredient._meta.db_table)
 
                 self.stdout.write(
                     self.style.SUCCESS(
@@ -23,6 +23,13 @@ class Ingredient(models.Model):
         return self.name
 
 
+class VisibleRecipeManager(models.Manager):
+    """Скрывает рецепты, ожидающие фонового удаления."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         CustomUser,
@@ -47,6 +54,7 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='recipes/images/',
+        db_index=True,
         verbose_name='Изображение',
         help_text='Загрузите изображение рецепта'
     )
@@ -70,10 +78,24 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         help_text='Дата создания рецепта'
     )
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='Удален',
+        help_text='Рецепт скрыт и удаляется в фоне'
+    )
+
+    objects = VisibleRecipeManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=['cooking_time'],
+                         name='recipe_cooking_time_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -104,6 +126,10 @@ class RecipeIngredient(models.Model):
         verbose_name = 'Ингредиент в рецепте'
         verbose_name_plural = 'Ингредиенты в рецепте'
         unique_together = ('recipe', 'ingredient')
+        indexes = [
+            models.Index(fields=['ingredient', 'recipe'],
+                         name='recipeingredient_ingr_rec_idx'),
+        ]
 
     def __str__(self):
         return f"{self.ingredient.name} в {self.recipe.name}"
@@ -157,3 +183,63 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f"{self.user.username} внес {self.recipe.name} в покупки"
+
+
+class RecipeSignature(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='signature',
+        verbose_name='Рецепт',
+        help_text='Рецепт, для которого посчитана сигнатура'
+    )
+    signature = models.BinaryField(
+        verbose_name='MinHash-сигнатура',
+        help_text='MinHash-сигнатура набора ингредиентов рецепта'
+    )
+
+    class Meta:
+        verbose_name = 'Сигнатура рецепта'
+        verbose_name_plural = 'Сигнатуры рецептов'
+
+    def __str__(self):
+        return f"Сигнатура {self.recipe_id}"
+
+
+class RecipeEngagement(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='engagement',
+        verbose_name='Рецепт',
+        help_text='Рецепт, для которого ведется счетчик'
+    )
+    bucket = models.DateTimeField(
+        verbose_name='Час',
+        help_text='Начало часа, за который ведется счетчик'
+    )
+    favorites = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Добавлений в избранное'
+    )
+    carts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Добавлений в список покупок'
+    )
+
+    class Meta:
+        verbose_name = 'Активность по рецепту'
+        verbose_name_plural = 'Активность по рецептам'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'bucket'],
+                name='unique_recipe_bucket'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['bucket'], name='engagement_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} за {self.bucket:%Y-%m-%d %H:00}"
@@ -42,11 +42,19 @@ class CustomUser(AbstractUser):
     )
     avatar = models.ImageField(
         upload_to='users/avatars/',
+        db_index=True,
         blank=True,
         null=True,
         verbose_name='Аватар',
         help_text='Загрузите свое изображение аватарки'
     )
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='Удален',
+        help_text='Пользователь скрыт и удаляется в фоне'
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']